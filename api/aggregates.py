@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional
+
+
+class RunningStats:
+    """Soma, contagem, mínimo, máximo de preço e histograma de ratings acumulados"""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "ratings")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.ratings: Dict[int, int] = {}
+
+    def add(self, preco: float, rating: int):
+        self.count += 1
+        self.total += preco
+        if preco < self.minimum:
+            self.minimum = preco
+        if preco > self.maximum:
+            self.maximum = preco
+        self.ratings[rating] = self.ratings.get(rating, 0) + 1
+
+    def to_dict(self) -> dict:
+        """Estado bruto para serialização (ver from_dict)"""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "minimum": self.minimum if self.count else None,
+            "maximum": self.maximum if self.count else None,
+            "ratings": [[rating, count] for rating, count in self.ratings.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningStats":
+        stats = cls()
+        stats.count = data["count"]
+        stats.total = data["total"]
+        if stats.count:
+            stats.minimum = data["minimum"]
+            stats.maximum = data["maximum"]
+        stats.ratings = {rating: count for rating, count in data["ratings"]}
+        return stats
+
+    def as_dict(self) -> dict:
+        """Campos de estatística no formato usado pela API"""
+        if not self.count:
+            return {
+                "total_livros": 0,
+                "preco_medio": 0.0,
+                "preco_minimo": 0.0,
+                "preco_maximo": 0.0,
+                "distribuicao_ratings": {},
+            }
+        return {
+            "total_livros": self.count,
+            "preco_medio": self.total / self.count,
+            "preco_minimo": self.minimum,
+            "preco_maximo": self.maximum,
+            "distribuicao_ratings": dict(self.ratings),
+        }
+
+
+class CatalogAggregates:
+    """Agregados da coleção mantidos incrementalmente a cada livro adicionado.
+
+    Os dicionários de resposta são montados apenas quando os agregados mudam,
+    então as rotas de estatísticas não percorrem os livros.
+    """
+
+    def __init__(self):
+        self.overall = RunningStats()
+        self.by_category: Dict[str, RunningStats] = {}
+        self._overview: Optional[dict] = None
+        self._categories: Optional[List[dict]] = None
+
+    def to_dict(self) -> dict:
+        """Estado bruto para serialização (ver from_dict)"""
+        return {
+            "overall": self.overall.to_dict(),
+            "by_category": [[categoria, stats.to_dict()] for categoria, stats in self.by_category.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CatalogAggregates":
+        aggregates = cls()
+        aggregates.overall = RunningStats.from_dict(data["overall"])
+        aggregates.by_category = {
+            categoria: RunningStats.from_dict(stats) for categoria, stats in data["by_category"]
+        }
+        return aggregates
+
+    def add(self, categoria: str, preco: float, rating: int):
+        """Contabiliza um novo livro"""
+        self.overall.add(preco, rating)
+        stats = self.by_category.get(categoria)
+        if stats is None:
+            stats = self.by_category[categoria] = RunningStats()
+        stats.add(preco, rating)
+        self._overview = None
+        self._categories = None
+
+    def overview(self) -> dict:
+        """Estatísticas gerais da coleção"""
+        if self._overview is None:
+            overview = self.overall.as_dict()
+            overview["total_categorias"] = len(self.by_category)
+            self._overview = overview
+        return self._overview
+
+    def categories(self) -> List[dict]:
+        """Estatísticas por categoria, das maiores para as menores"""
+        if self._categories is None:
+            stats = []
+            for categoria, running in self.by_category.items():
+                category_stats = running.as_dict()
+                category_stats["categoria"] = categoria
+                stats.append(category_stats)
+            self._categories = sorted(stats, key=lambda x: x['total_livros'], reverse=True)
+        return self._categories
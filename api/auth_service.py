@@ -70,7 +70,7 @@ class AuthService:
             return payload
         except jwt.ExpiredSignatureError:
             return None
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             return None
     
     def login(self, username: str, password: str) -> Dict[str, Any]:
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark das rotas de leitura de livros
+
+Compara, para cada rota, o caminho rápido da API (JSON pré-serializado em
+RawJSONResponse) com o caminho anterior (lista de modelos Book validada e
+serializada pelo response_model do FastAPI). As duas variantes rodam na mesma
+aplicação de teste, então o custo do TestClient é o mesmo nas duas.
+"""
+
+import argparse
+import timeit
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from data_service import DataService
+from fast_json import RawJSONResponse, orjson
+from models import Book, BookSearch
+
+def build_app(data_service: DataService) -> FastAPI:
+    """Aplicação com as rotas nos dois formatos (/model/... e /raw/...)"""
+    app = FastAPI()
+
+    @app.get("/model/books", response_model=List[Book])
+    def books_model():
+        return data_service.get_all_books()
+
+    @app.get("/raw/books", response_model=List[Book])
+    def books_raw():
+        return RawJSONResponse(data_service.get_all_books_json())
+
+    @app.get("/model/top-rated", response_model=List[Book])
+    def top_rated_model():
+        return data_service.get_top_rated_books()
+
+    @app.get("/raw/top-rated", response_model=List[Book])
+    def top_rated_raw():
+        return RawJSONResponse(data_service.get_top_rated_books_json())
+
+    @app.get("/model/search", response_model=BookSearch)
+    def search_model(title: str):
+        books = data_service.search_books(title=title)
+        return BookSearch(books=books, total=len(books))
+
+    @app.get("/raw/search", response_model=BookSearch)
+    def search_raw(title: str):
+        return RawJSONResponse(data_service.search_books_json(title=title))
+
+    @app.get("/model/book", response_model=Book)
+    def book_model(book_id: int):
+        return data_service.get_book_by_id(book_id)
+
+    @app.get("/raw/book", response_model=Book)
+    def book_raw(book_id: int):
+        return RawJSONResponse(data_service.get_book_by_id_json(book_id))
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara response_model com JSON pré-serializado")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--title", default="the", help="Termo usado na rota de busca")
+    args = parser.parse_args()
+
+    data_service = DataService()
+    client = TestClient(build_app(data_service))
+    routes = [
+        ("books", ""),
+        ("top-rated", ""),
+        ("search", f"?title={args.title}"),
+        ("book", "?book_id=1"),
+    ]
+
+    print(f"{len(data_service.store)} livros, serializador: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'rota':<12}{'response_model (ms)':>22}{'pré-serializado (ms)':>24}{'ganho':>10}")
+    for name, query in routes:
+        timings = {}
+        for variant in ("model", "raw"):
+            url = f"/{variant}/{name}{query}"
+            client.get(url)  # aquece os caches
+            timings[variant] = timeit.timeit(lambda: client.get(url), number=args.repeat) / args.repeat * 1000
+        speedup = timings["model"] / timings["raw"]
+        print(f"{name:<12}{timings['model']:>22.3f}{timings['raw']:>24.3f}{speedup:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
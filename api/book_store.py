@@ -0,0 +1,178 @@
+import csv
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple, Any
+from search_index import TitleIndex
+from aggregates import CatalogAggregates
+
+
+# Campos de um livro, na ordem do modelo Book
+BOOK_FIELDS = ("id", "titulo", "preco", "rating", "disponibilidade", "categoria", "imagem_url")
+
+
+class BookStore:
+    """Armazenamento colunar em memória dos livros.
+
+    Cada campo é guardado em uma coluna própria: preço e rating em arrays
+    tipados, categorias como códigos inteiros apontando para uma tabela de
+    strings, e títulos/URLs em listas de strings. Os valores são convertidos
+    uma única vez na carga, e não a cada requisição.
+    """
+
+    def __init__(self):
+        self.ids = array('l')
+        # Índice de chave primária: id_index[id] = posição do livro ou -1
+        self.id_index = array('l')
+        self.precos = array('d')
+        self.ratings = array('b')
+        self.categoria_codes = array('I')
+        self.categorias: List[str] = []
+        self._categoria_index: Dict[str, int] = {}
+        self.titulos: List[str] = []
+        self.disponibilidades: List[str] = []
+        self.imagens: List[str] = []
+        # Índice de preço: preços ordenados e a permutação de posições correspondente
+        self.price_sorted = array('d')
+        self.price_order = array('l')
+        self.title_index = TitleIndex()
+        self.aggregates = CatalogAggregates()
+        # Próximo id a ser atribuído (linhas inválidas também consomem um id)
+        self.next_id = 1
+        # Colunas somente leitura (ex.: mapeadas de um snapshot); ver thaw()
+        self.frozen = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "BookStore":
+        """Constrói o armazenamento a partir de linhas do CSV (ids sequenciais a partir de 1)"""
+        store = cls()
+        store.extend(rows)
+        return store
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Adiciona novas linhas com ids sequenciais e atualiza os índices.
+        
+        Retorna a quantidade de livros adicionados.
+        """
+        if self.frozen:
+            self.thaw()
+        added = 0
+        for row in rows:
+            book_id = self.next_id
+            self.next_id += 1
+            try:
+                self.append(book_id, row)
+                added += 1
+            except (ValueError, KeyError) as e:
+                print(f"Erro ao processar livro: {e}")
+                continue
+        self.build_indexes()
+        return added
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "BookStore":
+        """Lê o CSV e constrói o armazenamento colunar"""
+        with open(csv_path, 'r', encoding='utf-8') as file:
+            return cls.from_rows(csv.DictReader(file))
+
+    def category_code(self, categoria: str) -> int:
+        """Retorna o código da categoria, registrando-a se ainda não existir"""
+        code = self._categoria_index.get(categoria)
+        if code is None:
+            code = len(self.categorias)
+            categoria = sys.intern(categoria)
+            self.categorias.append(categoria)
+            self._categoria_index[categoria] = code
+        return code
+
+    def append(self, book_id: int, row: Dict[str, Any]):
+        """Adiciona um livro convertendo os campos para os tipos das colunas"""
+        # Converte tudo antes de gravar para não deixar colunas desalinhadas
+        preco = float(row['preco'])
+        rating = int(row['rating'])
+        if not -128 <= rating <= 127:
+            raise ValueError(f"rating fora do intervalo: {rating}")
+        titulo = str(row['titulo'])
+        disponibilidade = sys.intern(str(row['disponibilidade']))
+        categoria = str(row['categoria'])
+        imagem_url = str(row['imagem_url'])
+
+        if book_id < 0:
+            raise ValueError(f"id inválido: {book_id}")
+        
+        self.ids.append(book_id)
+        self.precos.append(preco)
+        self.ratings.append(rating)
+        self.categoria_codes.append(self.category_code(categoria))
+        self.titulos.append(titulo)
+        self.disponibilidades.append(disponibilidade)
+        self.imagens.append(imagem_url)
+        self.title_index.add(titulo)
+        self.aggregates.add(categoria, preco, rating)
+        
+        # Os ids são sequenciais, então o índice cresce de forma densa
+        missing = book_id + 1 - len(self.id_index)
+        if missing > 0:
+            self.id_index.extend(array('l', [-1]) * missing)
+        self.id_index[book_id] = len(self.ids) - 1
+
+    def thaw(self):
+        """Copia colunas somente leitura para estruturas mutáveis, permitindo append"""
+        self.ids = array('l', self.ids)
+        self.id_index = array('l', self.id_index)
+        self.precos = array('d', self.precos)
+        self.ratings = array('b', self.ratings)
+        self.categoria_codes = array('I', self.categoria_codes)
+        self.titulos = list(self.titulos)
+        self.disponibilidades = [sys.intern(value) for value in self.disponibilidades]
+        self.imagens = list(self.imagens)
+        self.price_order = array('l', self.price_order)
+        self.price_sorted = array('d', self.price_sorted)
+        self.title_index.thaw()
+        self.frozen = False
+
+    def build_indexes(self):
+        """(Re)constrói o índice de preço após a carga dos dados.
+
+        Os demais índices e agregados são mantidos incrementalmente em append.
+        """
+        precos = self.precos
+        self.price_order = array('l', sorted(range(len(precos)), key=precos.__getitem__))
+        self.price_sorted = array('d', (precos[i] for i in self.price_order))
+
+    def price_range_bounds(self, min_price: float, max_price: float) -> Tuple[int, int]:
+        """Retorna o intervalo [início, fim) do índice de preço dentro da faixa"""
+        start = bisect_left(self.price_sorted, min_price)
+        end = bisect_right(self.price_sorted, max_price)
+        return start, max(start, end)
+
+    def offset_of(self, book_id: int) -> int:
+        """Retorna a posição do livro com o id informado ou -1"""
+        if 0 <= book_id < len(self.id_index):
+            return self.id_index[book_id]
+        return -1
+
+    def categoria_at(self, offset: int) -> str:
+        """Retorna o nome da categoria do livro na posição informada"""
+        return self.categorias[self.categoria_codes[offset]]
+
+    def field(self, offset: int, name: str) -> Any:
+        """Retorna um único campo do livro na posição informada"""
+        if name == "categoria":
+            return self.categoria_at(offset)
+        column = {
+            "id": self.ids,
+            "titulo": self.titulos,
+            "preco": self.precos,
+            "rating": self.ratings,
+            "disponibilidade": self.disponibilidades,
+            "imagem_url": self.imagens,
+        }[name]
+        return column[offset]
+
+    def row(self, offset: int, fields: Iterable[str] = BOOK_FIELDS) -> Dict[str, Any]:
+        """Retorna os campos pedidos do livro na posição informada já tipados"""
+        return {name: self.field(offset, name) for name in fields}
@@ -0,0 +1,113 @@
+"""
+Compressão das respostas (gzip/brotli)
+
+Respostas dinâmicas acima de COMPRESSION_MIN_SIZE são comprimidas com gzip pelo
+GZipMiddleware. Os payloads que só mudam quando os dados são recarregados
+(catálogo completo, categorias, estatísticas, dados de treinamento) ficam em um
+PayloadCache do dataset com as variantes já comprimidas, geradas uma única vez
+por codificação e servidas conforme o Accept-Encoding.
+"""
+
+import gzip
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from fast_json import RawJSONResponse
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele apenas gzip é oferecido
+    brotli = None
+
+# Tamanho mínimo (em bytes) de uma resposta para valer a pena comprimir
+COMPRESSION_MIN_SIZE = int(os.getenv("BOOKS_COMPRESSION_MIN_SIZE", "1024"))
+
+# Níveis de compressão: os máximos (gzip 9, brotli 11) custam muito CPU por pouco ganho
+GZIP_LEVEL = int(os.getenv("BOOKS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BOOKS_BROTLI_QUALITY", "5"))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Codificação preferida suportada pelo cliente ("br", "gzip" ou None)"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].lower()] = quality
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Comprime o corpo com a codificação informada"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Codificação não suportada: {encoding}")
+
+
+class Payload:
+    """Corpo JSON de uma resposta com as variantes comprimidas geradas sob demanda"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._variants: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        data = self._variants.get(encoding)
+        if data is None:
+            # Requisições simultâneas esperam a mesma compressão em vez de repeti-la
+            with self._lock:
+                data = self._variants.get(encoding)
+                if data is None:
+                    data = self._variants[encoding] = compress(self.body, encoding)
+        return data
+
+    def response(self, accept_encoding: Optional[str], media_type: str = RawJSONResponse.media_type,
+                 headers: Optional[Dict[str, str]] = None) -> RawJSONResponse:
+        """Resposta com a variante adequada ao Accept-Encoding do cliente"""
+        encoding = negotiate_encoding(accept_encoding) if len(self.body) >= COMPRESSION_MIN_SIZE else None
+        headers = dict(headers or {}, Vary="Accept-Encoding")
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return RawJSONResponse(self.variant(encoding), headers=headers, media_type=media_type)
+
+
+class PayloadCache:
+    """Payloads de um dataset por nome, montados uma vez e descartados junto com o dataset"""
+
+    def __init__(self):
+        self._payloads: Dict[str, Payload] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, build: Callable[[], bytes]) -> Payload:
+        payload = self._payloads.get(name)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(name)
+                if payload is None:
+                    payload = self._payloads[name] = Payload(build())
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
@@ -1,7 +1,146 @@
-import csv
+import hashlib
 import os
-from typing import List, Optional, Dict, Any
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Iterable, Iterator
+import numpy as np
 from models import Book, MLFeature, MLFeatures, TrainingData
+from book_store import BookStore, BOOK_FIELDS
+from fast_json import dumps, join_array
+from response_cache import PredictionMemo, ResponseCache
+from compression import Payload, PayloadCache
+from query_planner import FilterIndexes, run_query
+from feature_store import FeatureStore, FEATURE_NAMES, encode_disponibilidade
+from ml_export import to_arrow, to_npy, to_npz
+from rating_model import AUTO_TRAIN, MODEL_DIR, MODEL_RELOAD_INTERVAL, ModelRegistry
+from snapshot import load_snapshot, read_snapshot_header, write_snapshot
+
+# Intervalo (em segundos) da verificação de mudanças no CSV; 0 desativa o recarregamento automático
+RELOAD_INTERVAL = float(os.getenv("BOOKS_RELOAD_INTERVAL", "0"))
+
+# Diretório (de preferência em /dev/shm) onde os workers compartilham o snapshot
+# gerado por um deles; vazio desativa o compartilhamento
+SHARED_DIR = os.getenv("BOOKS_SHARED_DIR", "")
+
+def file_version(path: str) -> str:
+    """Versão do dataset derivada do conteúdo do arquivo"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+class BookCache:
+    """Cache de modelos Book, construídos uma única vez no primeiro acesso.
+
+    Construir todos os Books na carga dominaria o tempo de inicialização em
+    catálogos grandes; assim só os livros efetivamente retornados são montados.
+    """
+    def __init__(self, store: BookStore, build):
+        self.store = store
+        self._build = build
+        self._books: List[Optional[Book]] = [None] * len(store)
+    
+    def __len__(self) -> int:
+        return len(self._books)
+    
+    def __getitem__(self, offset: int) -> Book:
+        book = self._books[offset]
+        if book is None:
+            book = self._books[offset] = self._build(self.store, offset)
+        return book
+    
+    def __iter__(self):
+        for offset in range(len(self._books)):
+            yield self[offset]
+    
+    def sync(self):
+        """Acompanha livros adicionados ao armazenamento depois da criação do cache"""
+        self._books.extend([None] * (len(self.store) - len(self._books)))
+
+class BookJsonCache:
+    """Cache do JSON (bytes) de cada livro, serializado uma única vez no primeiro acesso.
+
+    Guarda também o array com o catálogo inteiro, refeito apenas quando livros
+    são adicionados.
+    """
+    def __init__(self, store: BookStore):
+        self.store = store
+        self._items: List[Optional[bytes]] = [None] * len(store)
+        self._all: Optional[bytes] = None
+    
+    def __getitem__(self, offset: int) -> bytes:
+        item = self._items[offset]
+        if item is None:
+            item = self._items[offset] = dumps(self.store.row(offset))
+        return item
+    
+    def array(self, offsets: Iterable[int]) -> bytes:
+        """Array JSON com os livros das posições informadas"""
+        return join_array(self[i] for i in offsets)
+    
+    def all(self) -> bytes:
+        """Array JSON com todos os livros"""
+        if self._all is None:
+            self._all = self.array(range(len(self._items)))
+        return self._all
+    
+    def sync(self):
+        """Acompanha livros adicionados ao armazenamento depois da criação do cache"""
+        self._items.extend([None] * (len(self.store) - len(self._items)))
+        self._all = None
+
+class Dataset:
+    """Versão carregada dos dados: armazenamento colunar, cache de Books e metadados.
+
+    É imutável do ponto de vista das requisições: um recarregamento constrói um
+    novo Dataset e troca a referência de uma só vez.
+    """
+    def __init__(self, store: BookStore, books: BookCache, version: str,
+                 source_signature: Optional[tuple] = None, source_path: Optional[str] = None):
+        self.store = store
+        self.books = books
+        self.book_json = BookJsonCache(store)
+        self.payloads = PayloadCache()
+        self._filter_indexes: Optional[FilterIndexes] = None
+        self._filter_lock = threading.Lock()
+        self._feature_store: Optional[FeatureStore] = None
+        self._feature_lock = threading.Lock()
+        self.version = version
+        self.source_signature = source_signature
+        self.source_path = source_path
+        self.loaded_at = datetime.utcnow()
+    
+    @property
+    def filter_indexes(self) -> FilterIndexes:
+        """Bitmaps do planejador de consultas, montados no primeiro uso"""
+        indexes = self._filter_indexes
+        if indexes is None or indexes.size != len(self.store):
+            # Requisições simultâneas esperam a mesma montagem em vez de repeti-la
+            with self._filter_lock:
+                indexes = self._filter_indexes
+                if indexes is None or indexes.size != len(self.store):
+                    indexes = self._filter_indexes = FilterIndexes(self.store)
+        return indexes
+    
+    @property
+    def feature_store(self) -> FeatureStore:
+        """Matriz de features de ML, montada no primeiro uso"""
+        features = self._feature_store
+        if features is None or features.size != len(self.store):
+            with self._feature_lock:
+                features = self._feature_store
+                if features is None or features.size != len(self.store):
+                    features = self._feature_store = FeatureStore(self.store)
+        return features
+    
+    @property
+    def last_modified(self) -> datetime:
+        """Data de modificação dos dados (mtime do CSV de origem ou, sem ele, a hora da carga)"""
+        if self.source_signature is not None:
+            return datetime.fromtimestamp(self.source_signature[2] / 1e9, timezone.utc)
+        return self.loaded_at.replace(tzinfo=timezone.utc)
 
 class DataService:
     def __init__(self):
@@ -12,296 +151,436 @@ class DataService:
             self.csv_path = "/app/data/books_data.csv"
         else:
             self.csv_path = "data/books_data.csv"
-        self.books_data = []
+        # Snapshot binário gerado a partir do CSV (ver snapshot.py), preferido na carga
+        self.snapshot_path = os.getenv("BOOKS_SNAPSHOT_PATH", os.path.splitext(self.csv_path)[0] + ".snap")
+        empty = BookStore()
+        self.dataset = Dataset(empty, BookCache(empty, self._book_at), version="empty")
+        self._reload_lock = threading.Lock()
+        self._loaded = False
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        # Corpos de respostas de consultas, válidos apenas para o dataset atual
+        self.response_cache = ResponseCache()
+        # Predições individuais já calculadas, válidas para o modelo e os dados atuais
+        self.prediction_memo = PredictionMemo()
         self.load_data()
+        # Modelo de rating salvo junto dos dados (ou em BOOKS_MODEL_DIR)
+        self.models = ModelRegistry(MODEL_DIR or os.path.dirname(self.csv_path) or ".")
+        self.models.on_change(self.prediction_memo.clear)
+        if not self.models.load() and AUTO_TRAIN and len(self.store):
+            # Com vários workers, só o primeiro a obter o lock treina; os demais carregam o modelo salvo
+            self.retrain_model(only_if_missing=True)
+        if MODEL_RELOAD_INTERVAL > 0:
+            self.models.start_watching(MODEL_RELOAD_INTERVAL)
+        if RELOAD_INTERVAL > 0:
+            self.start_watching(RELOAD_INTERVAL)
+    
+    @property
+    def store(self) -> BookStore:
+        return self.dataset.store
+    
+    @property
+    def books(self) -> BookCache:
+        return self.dataset.books
     
-    def load_data(self):
-        """Carrega os dados do CSV"""
+    def _source_signature(self) -> Optional[tuple]:
+        """Identifica a versão do arquivo no disco (inode, tamanho e mtime)"""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    
+    def _load_snapshot(self, signature: Optional[tuple]):
+        """Carrega o snapshot se existir e corresponder ao CSV atual; senão retorna None"""
+        if not os.path.exists(self.snapshot_path):
+            return None
         try:
-            if os.path.exists(self.csv_path):
-                with open(self.csv_path, 'r', encoding='utf-8') as file:
-                    csv_reader = csv.DictReader(file)
-                    self.books_data = []
-                    for idx, row in enumerate(csv_reader, 1):
-                        row['id'] = idx
-                        self.books_data.append(row)
-            else:
-                self.books_data = []
+            header = read_snapshot_header(self.snapshot_path)
+            if signature is not None and header.get("source") != [signature[1], signature[2]]:
+                print(f"Snapshot desatualizado em relação ao CSV, ignorando: {self.snapshot_path}")
+                return None
+            store, header = load_snapshot(self.snapshot_path)
+            return store, header["version"]
         except Exception as e:
-            print(f"Erro ao carregar dados: {e}")
-            self.books_data = []
+            print(f"Erro ao carregar snapshot: {e}")
+            return None
     
-    def get_all_books(self) -> List[Book]:
-        """Retorna todos os livros"""
-        if not self.books_data:
-            return []
+    def _load_shared(self, signature: tuple):
+        """Carrega o dataset compartilhado entre os workers.
         
-        books = []
-        for row in self.books_data:
+        O primeiro worker que obtém o lock gera o snapshot do CSV atual em
+        SHARED_DIR; os demais esperam o lock e apenas mapeiam o arquivo, então
+        todos compartilham as mesmas páginas de memória.
+        """
+        try:
+            import fcntl  # apenas POSIX; o modo compartilhado não existe no Windows
+            
+            os.makedirs(SHARED_DIR, exist_ok=True)
+            path = os.path.join(SHARED_DIR, f"books_{signature[1]}_{signature[2]}.snap")
+            with open(os.path.join(SHARED_DIR, "books.lock"), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not os.path.exists(path):
+                    store = BookStore.from_csv(self.csv_path)
+                    write_snapshot(store, path, file_version(self.csv_path), (signature[1], signature[2]))
+                    # Remove snapshots de versões anteriores; quem ainda os mapeia mantém o acesso
+                    for name in os.listdir(SHARED_DIR):
+                        old_path = os.path.join(SHARED_DIR, name)
+                        if name.startswith("books_") and name.endswith(".snap") and old_path != path:
+                            os.remove(old_path)
+            store, header = load_snapshot(path)
+            return store, header["version"], path
+        except (ImportError, OSError) as e:
+            # Sem o diretório compartilhado (ou sem espaço nele) cada worker lê o CSV
+            print(f"Erro ao usar o snapshot compartilhado, lendo o CSV: {e}")
+            return BookStore.from_csv(self.csv_path), file_version(self.csv_path), self.csv_path
+    
+    def load_data(self) -> Dataset:
+        """Carrega os dados em um novo Dataset e o troca atomicamente pelo atual.
+        
+        Usa o snapshot binário (mmap, sem parsing) quando ele corresponde ao CSV;
+        com BOOKS_SHARED_DIR, usa o snapshot compartilhado entre os workers;
+        caso contrário lê o CSV.
+        
+        Só a primeira carga cai para um catálogo vazio em caso de erro; numa
+        recarga o Dataset atual é mantido e o erro é propagado.
+        """
+        with self._reload_lock:
+            signature = self._source_signature()
+            source_path = self.csv_path
             try:
-                book = Book(
-                    id=int(row['id']),
-                    titulo=str(row['titulo']),
-                    preco=float(row['preco']),
-                    rating=int(row['rating']),
-                    disponibilidade=str(row['disponibilidade']),
-                    categoria=str(row['categoria']),
-                    imagem_url=str(row['imagem_url'])
-                )
-                books.append(book)
-            except (ValueError, KeyError) as e:
-                print(f"Erro ao processar livro: {e}")
-                continue
-        return books
+                snapshot = self._load_snapshot(signature)
+                if snapshot is not None:
+                    store, version = snapshot
+                    source_path = self.snapshot_path
+                elif signature is not None and SHARED_DIR:
+                    store, version, source_path = self._load_shared(signature)
+                elif signature is not None:
+                    version = file_version(self.csv_path)
+                    store = BookStore.from_csv(self.csv_path)
+                elif self._loaded:
+                    raise FileNotFoundError(f"Arquivo de dados não encontrado: {self.csv_path}")
+                else:
+                    version = "empty"
+                    store = BookStore()
+            except Exception as e:
+                if self._loaded:
+                    raise
+                print(f"Erro ao carregar dados: {e}")
+                version = "empty"
+                store = BookStore()
+            
+            self.dataset = Dataset(store, BookCache(store, self._book_at), version, signature, source_path)
+            self._loaded = True
+            self.response_cache.clear()
+            self.prediction_memo.clear()
+            return self.dataset
+    
+    def reload_if_changed(self) -> bool:
+        """Recarrega os dados se o arquivo mudou desde a última carga"""
+        if self._source_signature() == self.dataset.source_signature:
+            return False
+        self.load_data()
+        return True
+    
+    def start_watching(self, interval: float):
+        """Inicia uma thread que verifica periodicamente se o CSV mudou"""
+        if self._watcher is not None:
+            return
+        
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    print(f"Erro ao recarregar dados, mantendo a versão {self.dataset.version}: {e}")
+        
+        self._watcher = threading.Thread(target=watch, name="books-data-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self):
+        """Interrompe a verificação periódica do CSV"""
+        self._stop_watching.set()
+        self._watcher = None
+    
+    def get_dataset_info(self) -> dict:
+        """Retorna metadados da versão de dados ativa"""
+        dataset = self.dataset
+        return {
+            "version": dataset.version,
+            "total_books": len(dataset.store),
+            "loaded_at": dataset.loaded_at,
+            "source_path": dataset.source_path or self.csv_path,
+            "auto_reload_interval": RELOAD_INTERVAL
+        }
+    
+    def _book_at(self, store: BookStore, offset: int) -> Book:
+        """Monta o modelo Book a partir de uma posição do armazenamento"""
+        return Book(
+            id=store.ids[offset],
+            titulo=store.titulos[offset],
+            preco=store.precos[offset],
+            rating=store.ratings[offset],
+            disponibilidade=store.disponibilidades[offset],
+            categoria=store.categoria_at(offset),
+            imagem_url=store.imagens[offset]
+        )
+    
+    def append_books(self, rows: List[Dict[str, Any]]) -> int:
+        """Adiciona novos livros ao armazenamento atual, atualizando índices e agregados"""
+        dataset = self.dataset
+        store = dataset.store
+        added = store.extend(rows)
+        dataset.books.sync()
+        dataset.book_json.sync()
+        dataset.payloads.clear()
+        self.response_cache.clear()
+        self.prediction_memo.clear()
+        return added
+    
+    def get_all_books(self) -> List[Book]:
+        """Retorna todos os livros"""
+        return list(self.dataset.books)
+    
+    def get_payload(self, name: str, build) -> Payload:
+        """Payload (com variantes comprimidas) que só muda quando os dados mudam"""
+        return self.dataset.payloads.get(name, build)
+    
+    def get_all_books_json(self) -> bytes:
+        """Retorna todos os livros como um array JSON já serializado"""
+        return self.dataset.book_json.all()
+    
+    @staticmethod
+    def _check_fields(fields: Optional[List[str]]) -> List[str]:
+        """Valida a projeção de campos (todos os campos quando vazia)"""
+        fields = list(fields or BOOK_FIELDS)
+        unknown = [name for name in fields if name not in BOOK_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+        return fields
+    
+    @staticmethod
+    def _page_bounds(store: BookStore, cursor: Optional[int], limit: Optional[int]):
+        """Posições (início, fim) da página que começa após o id cursor"""
+        start = bisect_right(store.ids, cursor) if cursor is not None else 0
+        end = len(store) if limit is None else min(start + limit, len(store))
+        return start, end
+    
+    def get_books_page(self, limit: Optional[int] = None, cursor: Optional[int] = None,
+                       fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Retorna uma página de livros com paginação por cursor (keyset).
+        
+        cursor é o último id da página anterior; como os ids crescem na ordem do
+        armazenamento, o início da página é uma busca binária. Só os livros da
+        página são montados, e apenas com os campos pedidos em fields. Sem
+        limit, a página vai do cursor até o fim do catálogo.
+        
+        Retorna {"books": [...], "total": int, "next_cursor": int ou None}.
+        """
+        store = self.store
+        fields = self._check_fields(fields)
+        start, end = self._page_bounds(store, cursor, limit)
+        books = [store.row(i, fields) for i in range(start, end)]
+        next_cursor = store.ids[end - 1] if end < len(store) and end > start else None
+        return {"books": books, "total": len(store), "next_cursor": next_cursor}
+    
+    def iter_books(self, fields: Optional[List[str]] = None, cursor: Optional[int] = None,
+                   limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Gera os livros um a um (para respostas em streaming).
+        
+        A validação dos campos acontece já na chamada, antes do primeiro livro,
+        e o gerador percorre sempre a versão dos dados vigente nesse momento.
+        """
+        store = self.store
+        fields = self._check_fields(fields)
+        start, end = self._page_bounds(store, cursor, limit)
+        return (store.row(i, fields) for i in range(start, end))
     
     def get_book_by_id(self, book_id: int) -> Optional[Book]:
         """Retorna um livro específico pelo ID"""
-        if not self.books_data:
+        dataset = self.dataset
+        offset = dataset.store.offset_of(book_id)
+        if offset < 0:
             return None
-        
-        for row in self.books_data:
-            if int(row['id']) == book_id:
-                try:
-                    return Book(
-                        id=int(row['id']),
-                        titulo=str(row['titulo']),
-                        preco=float(row['preco']),
-                        rating=int(row['rating']),
-                        disponibilidade=str(row['disponibilidade']),
-                        categoria=str(row['categoria']),
-                        imagem_url=str(row['imagem_url'])
-                    )
-                except (ValueError, KeyError) as e:
-                    print(f"Erro ao processar livro: {e}")
-                    return None
-        return None
-    
-    def search_books(self, title: Optional[str] = None, category: Optional[str] = None) -> List[Book]:
-        """Busca livros por título e/ou categoria"""
-        if not self.books_data:
+        return dataset.books[offset]
+    
+    def get_book_by_id_json(self, book_id: int) -> Optional[bytes]:
+        """Retorna o JSON já serializado de um livro pelo ID"""
+        dataset = self.dataset
+        offset = dataset.store.offset_of(book_id)
+        if offset < 0:
+            return None
+        return dataset.book_json[offset]
+    
+    def get_books_by_ids(self, book_ids: List[int]) -> List[Book]:
+        """Retorna os livros dos IDs informados, na ordem pedida, ignorando os inexistentes"""
+        dataset = self.dataset
+        store = dataset.store
+        books = dataset.books
+        result = []
+        for book_id in book_ids:
+            offset = store.offset_of(book_id)
+            if offset >= 0:
+                result.append(books[offset])
+        return result
+    
+    @staticmethod
+    def _search_offsets(store: BookStore, title: Optional[str], category: Optional[str],
+                        mode: str) -> List[int]:
+        """Posições dos livros que atendem aos filtros de título e categoria"""
+        if not len(store):
             return []
         
-        filtered_books = []
-        for row in self.books_data:
-            match = True
-            
-            if title:
-                if title.lower() not in row['titulo'].lower():
-                    match = False
-            
-            if category:
-                if category.lower() not in row['categoria'].lower():
-                    match = False
-            
-            if match:
-                try:
-                    book = Book(
-                        id=int(row['id']),
-                        titulo=str(row['titulo']),
-                        preco=float(row['preco']),
-                        rating=int(row['rating']),
-                        disponibilidade=str(row['disponibilidade']),
-                        categoria=str(row['categoria']),
-                        imagem_url=str(row['imagem_url'])
-                    )
-                    filtered_books.append(book)
-                except (ValueError, KeyError) as e:
-                    print(f"Erro ao processar livro: {e}")
-                    continue
-        
-        return filtered_books
+        # Resolve o filtro de categoria uma vez sobre a tabela de categorias
+        category_codes = None
+        if category:
+            category_lower = category.lower()
+            category_codes = {
+                code for code, name in enumerate(store.categorias)
+                if category_lower in name.lower()
+            }
+            if not category_codes:
+                return []
+        
+        if title:
+            offsets = store.title_index.search(title, mode)
+        else:
+            offsets = range(len(store))
+        
+        codes = store.categoria_codes
+        return [
+            i for i in offsets
+            if category_codes is None or codes[i] in category_codes
+        ]
+    
+    def search_books(self, title: Optional[str] = None, category: Optional[str] = None,
+                     mode: str = "substring") -> List[Book]:
+        """Busca livros por título e/ou categoria.
+        
+        mode: "substring", "prefix" ou "token" (ver TitleIndex.search)
+        """
+        dataset = self.dataset
+        books = dataset.books
+        return [books[i] for i in self._search_offsets(dataset.store, title, category, mode)]
+    
+    def search_books_json(self, title: Optional[str] = None, category: Optional[str] = None,
+                          mode: str = "substring") -> bytes:
+        """Mesma busca de search_books, já serializada no formato de BookSearch"""
+        dataset = self.dataset
+        offsets = self._search_offsets(dataset.store, title, category, mode)
+        return b'{"books":' + dataset.book_json.array(offsets) + b',"total":' + str(len(offsets)).encode() + b'}'
+    
+    def query_books_json(self, **filters) -> bytes:
+        """Consulta combinando filtros (ver query_planner.run_query), serializada no formato de BookQueryResult"""
+        dataset = self.dataset
+        result = run_query(dataset.store, dataset.filter_indexes, **filters)
+        return (
+            b'{"books":' + dataset.book_json.array(result["offsets"])
+            + b',"total":' + dumps(result["total"])
+            + b',"plan":' + dumps(result["plan"]) + b'}'
+        )
     
     def get_all_categories(self) -> List[str]:
         """Retorna todas as categorias únicas"""
-        if not self.books_data:
-            return []
-        
-        categories = set()
-        for row in self.books_data:
-            categories.add(row['categoria'])
-        
-        return sorted(list(categories))
+        return sorted(self.store.categorias)
     
     def get_total_books(self) -> int:
         """Retorna o total de livros"""
-        return len(self.books_data)
+        return len(self.store)
     
     def is_data_available(self) -> bool:
         """Verifica se os dados estão disponíveis"""
-        return len(self.books_data) > 0 and os.path.exists(self.csv_path)
+        return len(self.store) > 0 and (os.path.exists(self.csv_path) or os.path.exists(self.snapshot_path))
     
     def get_stats_overview(self) -> dict:
-        """Retorna estatísticas gerais da coleção"""
-        if not self.books_data:
-            return {
-                "total_livros": 0,
-                "preco_medio": 0.0,
-                "preco_minimo": 0.0,
-                "preco_maximo": 0.0,
-                "distribuicao_ratings": {},
-                "total_categorias": 0
-            }
-        
-        prices = []
-        ratings = []
-        categories = set()
-        
-        for row in self.books_data:
-            try:
-                prices.append(float(row['preco']))
-                ratings.append(int(row['rating']))
-                categories.add(row['categoria'])
-            except (ValueError, KeyError):
-                continue
-        
-        # Distribuição de ratings
-        rating_dist = {}
-        for rating in ratings:
-            rating_dist[rating] = rating_dist.get(rating, 0) + 1
-        
-        return {
-            "total_livros": len(self.books_data),
-            "preco_medio": sum(prices) / len(prices) if prices else 0.0,
-            "preco_minimo": min(prices) if prices else 0.0,
-            "preco_maximo": max(prices) if prices else 0.0,
-            "distribuicao_ratings": rating_dist,
-            "total_categorias": len(categories)
-        }
+        """Retorna estatísticas gerais da coleção (agregados pré-calculados)"""
+        return self.store.aggregates.overview()
     
     def get_stats_by_category(self) -> list:
-        """Retorna estatísticas detalhadas por categoria"""
-        if not self.books_data:
+        """Retorna estatísticas detalhadas por categoria (agregados pré-calculados)"""
+        return self.store.aggregates.categories()
+    
+    @staticmethod
+    def _top_rated_offsets(store: BookStore) -> List[int]:
+        """Posições dos livros com o rating mais alto"""
+        if not len(store):
             return []
-        
-        # Agrupa livros por categoria
-        categories_data = {}
-        for row in self.books_data:
-            try:
-                categoria = row['categoria']
-                preco = float(row['preco'])
-                rating = int(row['rating'])
-                
-                if categoria not in categories_data:
-                    categories_data[categoria] = {
-                        'prices': [],
-                        'ratings': []
-                    }
-                
-                categories_data[categoria]['prices'].append(preco)
-                categories_data[categoria]['ratings'].append(rating)
-            except (ValueError, KeyError):
-                continue
-        
-        # Calcula estatísticas para cada categoria
-        stats = []
-        for categoria, data in categories_data.items():
-            prices = data['prices']
-            ratings = data['ratings']
-            
-            # Distribuição de ratings para esta categoria
-            rating_dist = {}
-            for rating in ratings:
-                rating_dist[rating] = rating_dist.get(rating, 0) + 1
-            
-            stats.append({
-                "categoria": categoria,
-                "total_livros": len(prices),
-                "preco_medio": sum(prices) / len(prices) if prices else 0.0,
-                "preco_minimo": min(prices) if prices else 0.0,
-                "preco_maximo": max(prices) if prices else 0.0,
-                "distribuicao_ratings": rating_dist
-            })
-        
-        return sorted(stats, key=lambda x: x['total_livros'], reverse=True)
+        max_rating = max(store.ratings)
+        return [i for i, rating in enumerate(store.ratings) if rating == max_rating]
     
     def get_top_rated_books(self) -> List[Book]:
         """Retorna livros com melhor avaliação (rating mais alto)"""
-        if not self.books_data:
-            return []
+        dataset = self.dataset
+        books = dataset.books
+        return [books[i] for i in self._top_rated_offsets(dataset.store)]
+    
+    def get_top_rated_books_json(self) -> bytes:
+        """Retorna os livros com melhor avaliação como um array JSON já serializado"""
+        dataset = self.dataset
+        return dataset.book_json.array(self._top_rated_offsets(dataset.store))
+    
+    @staticmethod
+    def _price_range_offsets(store: BookStore, min_price: float, max_price: float,
+                             sort: str, limit: Optional[int], offset: int):
+        """Posições dos livros da faixa de preço, ordenadas e paginadas"""
+        start, end = store.price_range_bounds(min_price, max_price)
+        offsets = store.price_order[start:end]
+        
+        if sort == "id":
+            offsets = sorted(offsets)
+        elif sort == "-preco":
+            offsets = offsets[::-1]
+        elif sort != "preco":
+            raise ValueError(f"Ordenação inválida: {sort}")
+        
+        stop = None if limit is None else offset + limit
+        return offsets[offset:stop]
+    
+    def get_books_by_price_range_json(self, min_price: float, max_price: float,
+                                      sort: str = "id", limit: Optional[int] = None,
+                                      offset: int = 0) -> bytes:
+        """Filtra livros dentro de uma faixa de preço usando o índice de preço, no formato de PriceRangeFilter.
+        
+        sort: "id" (ordem original), "preco" (crescente) ou "-preco" (decrescente)
+        """
+        dataset = self.dataset
+        store = dataset.store
+        offsets = self._price_range_offsets(store, min_price, max_price, sort, limit, offset)
+        start, end = store.price_range_bounds(min_price, max_price)
+        return (
+            b'{"livros":' + dataset.book_json.array(offsets)
+            + b',"total":' + dumps(end - start)
+            + b',"preco_minimo":' + dumps(float(min_price))
+            + b',"preco_maximo":' + dumps(float(max_price)) + b'}'
+        )
+    
+    # ML Methods
+    # Quantidade de livros convertidos por vez nas respostas em streaming
+    FEATURE_CHUNK = 1024
+    
+    TRAINING_FEATURE_NAMES = FEATURE_NAMES
+    
+    def _iter_feature_chunks(self, rows) -> Iterator[Any]:
+        """Percorre as linhas do feature store em blocos (rows recebe o feature store e um slice)"""
+        features = self.dataset.feature_store
         
-        # Encontra o rating máximo
-        max_rating = 0
-        for row in self.books_data:
-            try:
-                rating = int(row['rating'])
-                max_rating = max(max_rating, rating)
-            except (ValueError, KeyError):
-                continue
-        
-        # Filtra livros com rating máximo
-        top_books = []
-        for row in self.books_data:
-            try:
-                if int(row['rating']) == max_rating:
-                    book = Book(
-                        id=int(row['id']),
-                        titulo=str(row['titulo']),
-                        preco=float(row['preco']),
-                        rating=int(row['rating']),
-                        disponibilidade=str(row['disponibilidade']),
-                        categoria=str(row['categoria']),
-                        imagem_url=str(row['imagem_url'])
-                    )
-                    top_books.append(book)
-            except (ValueError, KeyError):
-                continue
-        
-        return top_books
-    
-    def get_books_by_price_range(self, min_price: float, max_price: float) -> List[Book]:
-        """Filtra livros dentro de uma faixa de preço específica"""
-        if not self.books_data:
-            return []
+        def generate():
+            for start in range(0, features.size, self.FEATURE_CHUNK):
+                yield from rows(features, slice(start, start + self.FEATURE_CHUNK))
         
-        filtered_books = []
-        for row in self.books_data:
-            try:
-                preco = float(row['preco'])
-                if min_price <= preco <= max_price:
-                    book = Book(
-                        id=int(row['id']),
-                        titulo=str(row['titulo']),
-                        preco=float(row['preco']),
-                        rating=int(row['rating']),
-                        disponibilidade=str(row['disponibilidade']),
-                        categoria=str(row['categoria']),
-                        imagem_url=str(row['imagem_url'])
-                    )
-                    filtered_books.append(book)
-            except (ValueError, KeyError):
-                continue
-        
-        return filtered_books
+        return generate()
     
-    # ML Methods
-    def get_ml_features(self) -> MLFeatures:
-        """Retorna dados formatados para features de ML"""
-        if not self.books_data:
+    def iter_ml_features(self) -> Iterator[Dict[str, Any]]:
+        """Gera as features de ML livro a livro (para respostas em streaming)"""
+        return self._iter_feature_chunks(lambda features, selection: features.feature_rows(selection))
+    
+    def get_ml_features(self, sample_size: Optional[int] = None, seed: int = 0) -> MLFeatures:
+        """Retorna dados formatados para features de ML (opcionalmente uma amostra)"""
+        features = self.dataset.feature_store
+        if not features.size:
             return MLFeatures(features=[], total=0, feature_names=[])
         
-        # Mapeia categorias para números
-        categories = list(set(row['categoria'] for row in self.books_data))
-        category_mapping = {cat: idx for idx, cat in enumerate(categories)}
-        
-        features = []
-        for row in self.books_data:
-            try:
-                # Codifica disponibilidade: 1 para "In stock", 0 para outros
-                disponibilidade_encoded = 1 if "In stock" in row['disponibilidade'] else 0
-                
-                feature = MLFeature(
-                    id=int(row['id']),
-                    titulo_length=len(row['titulo']),
-                    preco=float(row['preco']),
-                    rating=int(row['rating']),
-                    disponibilidade_encoded=disponibilidade_encoded,
-                    categoria_encoded=category_mapping[row['categoria']],
-                    categoria=row['categoria']
-                )
-                features.append(feature)
-            except (ValueError, KeyError) as e:
-                print(f"Erro ao processar feature: {e}")
-                continue
+        rows = [MLFeature(**row) for row in features.feature_rows(features.sample(sample_size, seed))]
         
         feature_names = [
             "titulo_length", "preco", "rating", 
@@ -309,92 +588,180 @@ class DataService:
         ]
         
         return MLFeatures(
-            features=features,
-            total=len(features),
+            features=rows,
+            total=len(rows),
             feature_names=feature_names
         )
     
-    def get_training_data(self) -> TrainingData:
-        """Retorna dataset formatado para treinamento de ML"""
-        if not self.books_data:
-            return TrainingData(features=[], labels=[], feature_names=[], total_samples=0)
-        
-        # Mapeia categorias para números
-        categories = list(set(row['categoria'] for row in self.books_data))
-        category_mapping = {cat: idx for idx, cat in enumerate(categories)}
-        
-        features = []
-        labels = []
+    def export_ml_features(self, fmt: str, sample_size: Optional[int] = None, seed: int = 0) -> bytes:
+        """Features de ML em formato binário ("npy", "npz" ou "arrow").
+        
+        npy: matriz float32 com as colunas de FEATURE_NAMES; npz: essa matriz
+        (features) com ids, ratings e o vocabulário de categorias; arrow: uma
+        coluna por feature, com a categoria como coluna de dicionário.
+        """
+        features = self.dataset.feature_store
+        selection = features.sample(sample_size, seed)
+        matrix = features.matrix[selection]
+        if fmt == "npy":
+            return to_npy(matrix)
+        if fmt == "npz":
+            return to_npz({
+                "features": matrix,
+                "ids": features.ids[selection],
+                "ratings": features.labels[selection],
+                "feature_names": np.array(FEATURE_NAMES),
+                "categorias": np.array(features.vocabulary),
+            })
+        if fmt == "arrow":
+            columns = {"id": features.ids[selection]}
+            columns.update({name: matrix[:, k] for k, name in enumerate(FEATURE_NAMES)})
+            columns["rating"] = features.labels[selection]
+            columns["categoria"] = features.categoria_encoded[selection]
+            return to_arrow(columns, dictionaries={"categoria": features.vocabulary})
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+    
+    def iter_training_data(self) -> Iterator[Dict[str, Any]]:
+        """Gera as amostras de treinamento (features + rating) uma a uma"""
+        names = self.TRAINING_FEATURE_NAMES
         
-        for row in self.books_data:
-            try:
-                # Features numéricas
-                titulo_length = len(row['titulo'])
-                preco = float(row['preco'])
-                disponibilidade_encoded = 1 if "In stock" in row['disponibilidade'] else 0
-                categoria_encoded = category_mapping[row['categoria']]
-                
-                # Label (target)
-                rating = int(row['rating'])
-                
-                features.append([titulo_length, preco, disponibilidade_encoded, categoria_encoded])
-                labels.append(rating)
-                
-            except (ValueError, KeyError) as e:
-                print(f"Erro ao processar dados de treinamento: {e}")
-                continue
+        def rows(features, selection):
+            labels = features.labels[selection].tolist()
+            for vector, label in zip(features.training_rows(selection), labels):
+                yield dict(zip(names, vector), rating=label)
         
-        feature_names = [
-            "titulo_length", "preco", "disponibilidade_encoded", "categoria_encoded"
-        ]
+        return self._iter_feature_chunks(rows)
+    
+    def get_training_data(self, sample_size: Optional[int] = None, seed: int = 0) -> TrainingData:
+        """Retorna dataset formatado para treinamento de ML (opcionalmente uma amostra)"""
+        features = self.dataset.feature_store
+        if not features.size:
+            return TrainingData(features=[], labels=[], feature_names=[], total_samples=0)
         
+        selection = features.sample(sample_size, seed)
+        labels = features.labels[selection].tolist()
         return TrainingData(
-            features=features,
+            features=features.training_rows(selection),
             labels=labels,
-            feature_names=feature_names,
-            total_samples=len(features)
+            feature_names=list(self.TRAINING_FEATURE_NAMES),
+            total_samples=len(labels)
         )
     
+    def export_training_data(self, fmt: str, sample_size: Optional[int] = None,
+                             validation_fraction: Optional[float] = None, seed: int = 0) -> bytes:
+        """Dataset de treinamento em formato binário ("npy", "npz" ou "arrow").
+        
+        npy: matriz float32 com as features e o rating na última coluna; npz:
+        features e labels (ou train_*/validation_* com validation_fraction);
+        arrow: uma coluna por feature mais rating (e split com validation_fraction).
+        """
+        features = self.dataset.feature_store
+        selection = features.sample(sample_size, seed)
+        names = np.array(FEATURE_NAMES)
+        
+        if fmt == "npy":
+            if validation_fraction is not None:
+                raise ValueError("A divisão treino/validação exige o formato npz ou arrow")
+            matrix = features.matrix[selection]
+            return to_npy(np.column_stack([matrix, features.labels[selection].astype(np.float32)]))
+        
+        if fmt == "npz":
+            if validation_fraction is None:
+                return to_npz({
+                    "features": features.matrix[selection],
+                    "labels": features.labels[selection],
+                    "feature_names": names,
+                })
+            train, validation = features.split(selection, validation_fraction, seed)
+            return to_npz({
+                "train_features": features.matrix[train],
+                "train_labels": features.labels[train],
+                "validation_features": features.matrix[validation],
+                "validation_labels": features.labels[validation],
+                "feature_names": names,
+            })
+        
+        if fmt == "arrow":
+            positions = np.arange(features.size)[selection]
+            columns = {name: features.matrix[positions, k] for k, name in enumerate(FEATURE_NAMES)}
+            columns["rating"] = features.labels[positions]
+            dictionaries = {}
+            if validation_fraction is not None:
+                _, validation = features.split(selection, validation_fraction, seed)
+                columns["split"] = np.isin(positions, validation).astype(np.int32)
+                dictionaries["split"] = ["train", "validation"]
+            return to_arrow(columns, dictionaries)
+        
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+    
+    def predict_ratings(self, titulo_length: List[int], preco: List[float],
+                        disponibilidade: List[str], categoria: List[str]) -> Dict[str, np.ndarray]:
+        """Predições em lote: cada argumento é uma coluna com uma entrada por item.
+        
+        As entradas são codificadas de uma vez e o modelo ativo (ver
+        rating_model) roda sobre arrays, sem laço por item.
+        """
+        categoria_encoded = self.dataset.feature_store.encode_categories(categoria)
+        categoria_encoded[categoria_encoded < 0] = 0  # Categoria desconhecida
+        disponibilidade_encoded = np.fromiter(
+            (encode_disponibilidade(d) for d in disponibilidade), dtype=np.int64, count=len(disponibilidade)
+        )
+        predicted, confidence = self.models.current.predict(
+            np.asarray(titulo_length, dtype=np.int64), np.asarray(preco, dtype=np.float64),
+            disponibilidade_encoded, categoria
+        )
+        return {
+            "predicted_rating": predicted,
+            "confidence": confidence,
+            "disponibilidade_encoded": disponibilidade_encoded,
+            "categoria_encoded": categoria_encoded,
+        }
+    
+    def retrain_model(self, only_if_missing: bool = False) -> bool:
+        """Retreina o modelo de rating em segundo plano com os dados atuais.
+        
+        Retorna False se já houver um treino em andamento. Com only_if_missing,
+        não treina se outro processo já salvou um modelo.
+        """
+        def training_set():
+            dataset = self.dataset
+            features = dataset.feature_store
+            return features.matrix, features.labels, features.vocabulary, dataset.version
+        
+        return self.models.retrain_async(training_set, only_if_missing)
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """Metadados do modelo de rating ativo"""
+        info = self.models.info()
+        info["stale"] = info.get("dataset_version") not in (None, self.dataset.version)
+        return info
+    
     def predict_rating(self, titulo_length: int, preco: float, 
                       disponibilidade: str, categoria: str) -> Dict[str, Any]:
-        """Predição simples de rating baseada em heurísticas"""
-        # Mapeia categorias existentes
-        categories = list(set(row['categoria'] for row in self.books_data))
-        if categoria not in categories:
-            categoria_encoded = 0  # Categoria desconhecida
-        else:
-            category_mapping = {cat: idx for idx, cat in enumerate(categories)}
-            categoria_encoded = category_mapping[categoria]
-        
-        disponibilidade_encoded = 1 if "In stock" in disponibilidade else 0
-        
-        # Heurística simples para predição
-        # Baseada em análise dos dados existentes
-        predicted_rating = 3  # Rating padrão
-        confidence = 0.5
-        
-        # Ajusta rating baseado no preço (livros mais caros tendem a ter ratings melhores)
-        if preco > 50:
-            predicted_rating += 1
-            confidence += 0.1
-        elif preco < 20:
-            predicted_rating -= 1
-            confidence += 0.1
-        
-        # Ajusta rating baseado na disponibilidade
-        if disponibilidade_encoded == 1:
-            predicted_rating += 0.5
-            confidence += 0.1
-        
-        # Ajusta rating baseado no tamanho do título
-        if titulo_length > 50:
-            predicted_rating += 0.3
-        elif titulo_length < 20:
-            predicted_rating -= 0.3
-        
-        # Limita rating entre 1 e 5
-        predicted_rating = max(1, min(5, round(predicted_rating)))
-        confidence = min(1.0, confidence)
+        """Predição de rating de um livro com o modelo ativo.
+        
+        O resultado é memorizado com chave nas features codificadas e nas
+        versões do modelo e dos dados (categorias desconhecidas entram pelo nome).
+        """
+        # Cada entrada é codificada uma única vez, para a chave e para o modelo
+        categoria_code = self.dataset.feature_store.category_index(categoria)
+        disponibilidade_encoded = encode_disponibilidade(disponibilidade)
+        categoria_encoded = max(categoria_code, 0)  # Categoria desconhecida
+        model = self.models.current
+        key = (
+            int(titulo_length), float(preco), disponibilidade_encoded,
+            categoria_code if categoria_code >= 0 else categoria,
+            model.version, self.dataset.version,
+        )
+        
+        def predict():
+            predicted, confidence = model.predict(
+                np.array([titulo_length], dtype=np.int64), np.array([preco], dtype=np.float64),
+                np.array([disponibilidade_encoded], dtype=np.int64), [categoria]
+            )
+            return int(predicted[0]), float(confidence[0])
+        
+        predicted_rating, confidence = self.prediction_memo.get_or_build(key, predict)
         
         return {
             "predicted_rating": predicted_rating,
@@ -0,0 +1,42 @@
+"""
+Serialização JSON rápida para as rotas de leitura
+
+Os livros são serializados uma única vez (bytes em cache) e as respostas são
+montadas concatenando esses bytes, sem construir modelos pydantic nem passar
+pela validação do response_model a cada requisição.
+"""
+
+import json
+from typing import Any, Iterable
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Serializa um valor em JSON (UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    """Desserializa JSON (levanta ValueError se inválido)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def join_array(items: Iterable[bytes]) -> bytes:
+    """Monta um array JSON a partir de elementos já serializados"""
+    return b"[" + b",".join(items) + b"]"
+
+
+class RawJSONResponse(Response):
+    """Resposta com um corpo JSON já serializado (bytes)"""
+
+    media_type = "application/json"
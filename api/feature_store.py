@@ -0,0 +1,126 @@
+"""
+Feature store dos endpoints de Machine Learning
+
+Monta uma única vez por versão dos dados o vocabulário de categorias (ordenado,
+portanto igual entre workers e reinícios), a matriz de features float32
+contígua (uma linha por livro) e o vetor de labels (ratings). Os endpoints de
+ML apenas fatiam essas estruturas.
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from book_store import BookStore
+
+FEATURE_NAMES = ["titulo_length", "preco", "disponibilidade_encoded", "categoria_encoded"]
+
+# Casas decimais usadas ao converter os float32 da matriz para JSON
+JSON_DECIMALS = 4
+
+
+def encode_with_vocabulary(vocabulary: np.ndarray, categorias: List[str]) -> np.ndarray:
+    """Posições das categorias em um vocabulário ordenado (-1 para desconhecidas)"""
+    if not len(vocabulary) or not categorias:
+        return np.full(len(categorias), -1, dtype=np.int64)
+    names = np.array(categorias, dtype=str)
+    positions = np.searchsorted(vocabulary, names)
+    clipped = np.minimum(positions, len(vocabulary) - 1)
+    return np.where(vocabulary[clipped] == names, clipped, -1)
+
+
+def encode_disponibilidade(disponibilidade: str) -> int:
+    """Codifica disponibilidade: 1 para "In stock", 0 para outros"""
+    return 1 if "In stock" in disponibilidade else 0
+
+
+class FeatureStore:
+    """Vocabulário de categorias, matriz de features e labels de um BookStore"""
+
+    def __init__(self, store: BookStore):
+        size = len(store)
+        self.size = size
+        self.ids = np.asarray(store.ids, dtype=np.int64)
+        self.vocabulary: List[str] = sorted(store.categorias)
+        # Mesmo vocabulário como array, para codificar categorias em lote
+        self._vocabulary_array = np.array(self.vocabulary, dtype=str)
+
+        # Código do armazenamento (ordem de chegada) -> posição no vocabulário ordenado
+        remap = np.array([self.category_index(name) for name in store.categorias], dtype=np.int64)
+        codes = np.asarray(store.categoria_codes, dtype=np.int64)
+        self.categoria_encoded = remap[codes] if size else np.empty(0, dtype=np.int64)
+
+        matrix = np.empty((size, len(FEATURE_NAMES)), dtype=np.float32)
+        matrix[:, 0] = np.fromiter((len(titulo) for titulo in store.titulos), dtype=np.float32, count=size)
+        matrix[:, 1] = np.asarray(store.precos, dtype=np.float64)
+        matrix[:, 2] = np.fromiter(
+            (encode_disponibilidade(d) for d in store.disponibilidades), dtype=np.float32, count=size
+        )
+        matrix[:, 3] = self.categoria_encoded
+        self.matrix = matrix
+        self.labels = np.asarray(store.ratings, dtype=np.int8)
+
+    def category_index(self, categoria: str) -> int:
+        """Posição da categoria no vocabulário ou -1"""
+        position = bisect.bisect_left(self.vocabulary, categoria)
+        if position < len(self.vocabulary) and self.vocabulary[position] == categoria:
+            return position
+        return -1
+
+    def encode_categories(self, categorias: List[str]) -> np.ndarray:
+        """Posições das categorias no vocabulário (-1 para desconhecidas), de uma vez"""
+        return encode_with_vocabulary(self._vocabulary_array, categorias)
+
+    def _columns(self, selection) -> Dict[str, list]:
+        """Colunas das linhas selecionadas convertidas para tipos Python"""
+        block = self.matrix[selection]
+        return {
+            "titulo_length": block[:, 0].astype(np.int64).tolist(),
+            "preco": np.round(block[:, 1].astype(np.float64), JSON_DECIMALS).tolist(),
+            "disponibilidade_encoded": block[:, 2].astype(np.int64).tolist(),
+            "categoria_encoded": block[:, 3].astype(np.int64).tolist(),
+        }
+
+    def feature_rows(self, selection=slice(None)) -> List[Dict[str, Any]]:
+        """Features por livro (com id, rating e nome da categoria) das linhas selecionadas.
+
+        selection é um slice ou um array de posições (ver sample).
+        """
+        columns = self._columns(selection)
+        ids = self.ids[selection].tolist()
+        labels = self.labels[selection].tolist()
+        vocabulary = self.vocabulary
+        return [
+            {
+                "id": ids[k],
+                "titulo_length": columns["titulo_length"][k],
+                "preco": columns["preco"][k],
+                "rating": labels[k],
+                "disponibilidade_encoded": columns["disponibilidade_encoded"][k],
+                "categoria_encoded": columns["categoria_encoded"][k],
+                "categoria": vocabulary[columns["categoria_encoded"][k]],
+            }
+            for k in range(len(ids))
+        ]
+
+    def training_rows(self, selection=slice(None)) -> List[List[float]]:
+        """Vetores de features (na ordem de FEATURE_NAMES) das linhas selecionadas"""
+        block = self.matrix[selection].astype(np.float64)
+        block[:, 1] = np.round(block[:, 1], JSON_DECIMALS)
+        return block.tolist()
+
+    def sample(self, sample_size: Optional[int] = None, seed: int = 0):
+        """Seleção das linhas: todas (slice) ou uma amostra aleatória reprodutível pela seed"""
+        if sample_size is None or sample_size >= self.size:
+            return slice(None)
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(self.size, size=sample_size, replace=False))
+
+    def split(self, selection, validation_fraction: float, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Divide as linhas selecionadas em (treino, validação), embaralhadas pela seed"""
+        positions = np.arange(self.size)[selection]
+        rng = np.random.default_rng(seed)
+        shuffled = rng.permutation(positions)
+        validation_size = int(round(len(shuffled) * validation_fraction))
+        return np.sort(shuffled[validation_size:]), np.sort(shuffled[:validation_size])
@@ -0,0 +1,122 @@
+"""
+Cache HTTP das rotas de leitura (ETag, If-None-Match e Cache-Control)
+
+Os dados só mudam quando o dataset é recarregado, então o ETag de uma resposta
+é derivado da versão do dataset e dos parâmetros da requisição, sem olhar o
+corpo: uma requisição condicional com ETag atual é respondida com 304 antes de
+a rota calcular qualquer coisa.
+"""
+
+import hashlib
+import os
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from compression import negotiate_encoding
+from data_service import Dataset
+from ml_export import export_format
+from streaming import streaming_format
+
+# max-age (em segundos) do Cache-Control das rotas de leitura
+CACHE_MAX_AGE = int(os.getenv("BOOKS_CACHE_MAX_AGE", "60"))
+
+# Rotas de leitura que não dependem só do dataset (ou não devem ir para caches compartilhados);
+# /ml/model muda a cada retreino, sem mudança de dados
+UNCACHED_PREFIXES = ("/api/v1/admin", "/api/v1/auth", "/api/v1/health", "/api/v1/ml/model")
+
+
+def is_cacheable(request: Request) -> bool:
+    """Indica se a requisição é uma leitura de dados do catálogo"""
+    path = request.url.path
+    return (
+        request.method in ("GET", "HEAD")
+        and path.startswith("/api/v1/")
+        and not path.startswith(UNCACHED_PREFIXES)
+    )
+
+
+def request_key(request: Request) -> str:
+    """Chave da requisição: rota, parâmetros normalizados (ordenados), formato e codificação pedidos"""
+    params = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    accept = request.headers.get("accept")
+    fmt = streaming_format(accept) or export_format(accept) or "json"
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) or "identity"
+    return f"{request.url.path}?{params}#{fmt}#{encoding}"
+
+
+def make_etag(dataset: Dataset, request: Request) -> str:
+    """ETag forte da resposta para a versão de dados ativa"""
+    # A quantidade de livros entra na chave porque append_books altera o dataset sem mudar a versão
+    source = f"{dataset.version}:{len(dataset.store)}:{request_key(request)}"
+    return '"' + hashlib.sha1(source.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o cabeçalho If-None-Match com o ETag (comparação fraca, como pede a RFC 9110)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(dataset: Dataset, etag: str) -> Dict[str, str]:
+    """Cabeçalhos de cache de uma resposta de leitura"""
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(dataset.last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": f"public, max-age={CACHE_MAX_AGE}",
+    }
+
+
+class ConditionalGetMiddleware:
+    """Middleware ASGI que adiciona os cabeçalhos de cache e responde 304 quando possível.
+
+    É ASGI puro (e não um BaseHTTPMiddleware) para não alterar a forma como o
+    corpo é enviado: o GZipMiddleware externo continua vendo respostas de uma
+    única mensagem e respeitando o tamanho mínimo para comprimir.
+    """
+
+    def __init__(self, app: ASGIApp, data_service):
+        self.app = app
+        self.data_service = data_service
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        if not is_cacheable(request):
+            await self.app(scope, receive, send)
+            return
+
+        dataset = self.data_service.dataset
+        etag = make_etag(dataset, request)
+        headers = cache_headers(dataset, etag)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            response = Response(status_code=304, headers=headers)
+            response.headers.add_vary_header("Accept")
+            response.headers.add_vary_header("Accept-Encoding")
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(scope=message)
+                response_headers.update(headers)
+                response_headers.add_vary_header("Accept")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
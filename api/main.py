@@ -1,8 +1,24 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, status
+from fastapi.responses import JSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import os
+import re
 from typing import Optional, List
-from models import Book, BookSearch, HealthCheck, StatsOverview, StatsCategories, CategoryStats, PriceRangeFilter, MLFeatures, TrainingData, PredictionRequest, PredictionResponse, LoginRequest, TokenResponse, RefreshTokenRequest
+from models import Book, BookSearch, BookQueryResult, BatchPredictionResponse, HealthCheck, DatasetInfo, ModelInfo, PredictionCacheStats, ResponseCacheStats, StatsOverview, StatsCategories, CategoryStats, PriceRangeFilter, MLFeatures, TrainingData, PredictionRequest, PredictionResponse, LoginRequest, TokenResponse, RefreshTokenRequest
 from data_service import DataService
 from auth_service import AuthService
+from book_store import BOOK_FIELDS
+from streaming import NDJSON_MEDIA_TYPE, streaming_format, stream_rows
+from fast_json import RawJSONResponse, dumps, loads
+from compression import COMPRESSION_MIN_SIZE
+from ml_export import FILE_EXTENSIONS, MEDIA_TYPES, arrow_available, export_format
+import http_cache
+from search_index import SEARCH_MODES, normalize_text
+from query_planner import SORT_OPTIONS
 
 app = FastAPI(
     title="Books API",
@@ -60,65 +76,178 @@ app = FastAPI(
 # Inicializa os serviços
 data_service = DataService()
 auth_service = AuthService()
+bearer_scheme = HTTPBearer()
+
+# Quantidade máxima de entradas em uma requisição de predição em lote
+MAX_BATCH_SIZE = int(os.getenv("BOOKS_MAX_BATCH_SIZE", "10000"))
+# Tamanho máximo do corpo do lote em bytes (verificado antes de qualquer parsing)
+MAX_BATCH_BYTES = int(os.getenv("BOOKS_MAX_BATCH_BYTES", str(MAX_BATCH_SIZE * 512)))
+prediction_batch = TypeAdapter(List[PredictionRequest])
+
+def choice_pattern(options) -> str:
+    """Expressão regular que aceita exatamente uma das opções"""
+    return "^(" + "|".join(re.escape(option) for option in options) + ")$"
+
+def response_cache_key(*parts) -> tuple:
+    """Chave do cache de respostas: versão e tamanho do dataset atual seguidos dos parâmetros.
+    
+    O dataset é lido uma vez, antes da consulta, então um corpo calculado durante
+    uma recarga nunca fica guardado sob a chave dos dados novos.
+    """
+    dataset = data_service.dataset
+    return (dataset.version, len(dataset.store)) + parts
+
+def require_access_token(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+    """Exige um access token JWT válido no cabeçalho Authorization"""
+    payload = auth_service.verify_token(credentials.credentials, "access")
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+# ETag/Cache-Control nas rotas de leitura e 304 quando o cliente já tem a versão atual
+app.add_middleware(http_cache.ConditionalGetMiddleware, data_service=data_service)
+# Registrado por último, fica por fora do anterior: comprime as respostas dinâmicas
+# (já com os cabeçalhos de cache) e ignora as que vêm pré-comprimidas
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 @app.get("/")
 def read_root():
     return {"message": "ok"}
 
 @app.get("/api/v1/books", response_model=List[Book], tags=["Livros"])
-def get_all_books():
-    """Lista todos os livros disponíveis na base de dados"""
-    books = data_service.get_all_books()
-    return books
+def get_all_books(
+    request: Request,
+    ids: Optional[str] = Query(None, description="Lista de IDs separados por vírgula (ex: 1,2,3)"),
+    limit: Optional[int] = Query(None, description="Quantidade de livros por página", ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Cursor da página (valor de X-Next-Cursor da página anterior)"),
+    fields: Optional[str] = Query(None, description="Campos retornados, separados por vírgula (ex: id,titulo,preco)")
+):
+    """Lista os livros disponíveis na base de dados.
+    
+    Com limit/cursor/fields a resposta é paginada: o total vai no cabeçalho
+    X-Total-Count e o cursor da próxima página em X-Next-Cursor (e no Link).
+    Sem limit, são retornados todos os livros (a partir do cursor, se houver).
+    Com Accept: application/x-ndjson ou text/csv os livros são enviados em
+    streaming, linha a linha.
+    """
+    if ids is not None:
+        try:
+            book_ids = [int(book_id) for book_id in ids.split(",") if book_id.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="O parâmetro ids deve conter apenas números inteiros separados por vírgula")
+        return data_service.get_books_by_ids(book_ids)
+    
+    field_list = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    fmt = streaming_format(request.headers.get("accept"))
+    if fmt:
+        try:
+            rows = data_service.iter_books(field_list, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return stream_rows(rows, fmt, field_list or list(BOOK_FIELDS), filename="books")
+    
+    if limit is None and cursor is None and fields is None:
+        payload = data_service.get_payload("books", data_service.get_all_books_json)
+        return payload.response(request.headers.get("accept-encoding"))
+    
+    try:
+        page = data_service.get_books_page(limit, cursor=cursor, fields=field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Total-Count": str(page["total"])}
+    if page["next_cursor"] is not None:
+        headers["X-Next-Cursor"] = str(page["next_cursor"])
+        next_url = request.url.include_query_params(cursor=page["next_cursor"])
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return JSONResponse(content=page["books"], headers=headers)
 
 @app.get("/api/v1/books/search", response_model=BookSearch, tags=["Livros"])
 def search_books(
     title: Optional[str] = Query(None, description="Título do livro para busca"),
-    category: Optional[str] = Query(None, description="Categoria do livro para busca")
+    category: Optional[str] = Query(None, description="Categoria do livro para busca"),
+    mode: str = Query("substring", description=f"Modo de busca no título: {', '.join(SEARCH_MODES)}", pattern=choice_pattern(SEARCH_MODES))
 ):
     """Busca livros por título e/ou categoria"""
     if not title and not category:
         raise HTTPException(status_code=400, detail="Pelo menos um parâmetro de busca (title ou category) deve ser fornecido")
     
-    books = data_service.search_books(title=title, category=category)
-    return BookSearch(books=books, total=len(books))
+    # A busca ignora maiúsculas e acentos, então a chave usa os termos normalizados
+    key = response_cache_key("search", normalize_text(title) if title else None, category.lower() if category else None, mode)
+    body = data_service.response_cache.get_or_build(
+        key, lambda: data_service.search_books_json(title=title, category=category, mode=mode)
+    )
+    return RawJSONResponse(body)
+
+@app.get("/api/v1/books/query", response_model=BookQueryResult, tags=["Livros"])
+def query_books(
+    category: Optional[str] = Query(None, description="Categoria exata (sem diferenciar maiúsculas)"),
+    min_rating: Optional[int] = Query(None, description="Rating mínimo", ge=0, le=5),
+    min_price: Optional[float] = Query(None, description="Preço mínimo", ge=0),
+    max_price: Optional[float] = Query(None, description="Preço máximo", ge=0),
+    title: Optional[str] = Query(None, description="Texto contido no título"),
+    in_stock: Optional[bool] = Query(None, description="Apenas livros em estoque (true) ou fora de estoque (false)"),
+    sort: str = Query("id", description=f"Ordenação: {', '.join(SORT_OPTIONS)}", pattern=choice_pattern(SORT_OPTIONS)),
+    limit: Optional[int] = Query(None, description="Quantidade máxima de livros retornados", ge=1),
+    offset: int = Query(0, description="Quantidade de livros a pular", ge=0)
+):
+    """Consulta livros combinando filtros de categoria, rating, preço, título e estoque.
+    
+    O plano de execução (índice usado para os candidatos, filtros verificados e
+    estratégia de ordenação) é retornado em plan.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="Preço mínimo não pode ser maior que o preço máximo")
+    
+    filters = dict(
+        categoria=category, min_rating=min_rating, min_price=min_price, max_price=max_price,
+        title=title, in_stock=in_stock, sort=sort, limit=limit, offset=offset
+    )
+    key = response_cache_key("query", category.lower() if category else None, min_rating, min_price, max_price,
+           normalize_text(title) if title else None, in_stock, sort, limit, offset)
+    body = data_service.response_cache.get_or_build(key, lambda: data_service.query_books_json(**filters))
+    return RawJSONResponse(body)
 
 @app.get("/api/v1/books/top-rated", response_model=List[Book], tags=["Livros"])
 def get_top_rated_books():
     """Lista os livros com melhor avaliação (rating mais alto)"""
-    top_books = data_service.get_top_rated_books()
-    return top_books
+    return RawJSONResponse(data_service.get_top_rated_books_json())
 
 @app.get("/api/v1/books/price-range", response_model=PriceRangeFilter, tags=["Livros"])
 def get_books_by_price_range(
     min: float = Query(..., description="Preço mínimo", ge=0),
-    max: float = Query(..., description="Preço máximo", ge=0)
+    max: float = Query(..., description="Preço máximo", ge=0),
+    sort: str = Query("id", description="Ordenação: id, preco ou -preco", pattern="^(id|preco|-preco)$"),
+    limit: Optional[int] = Query(None, description="Quantidade máxima de livros retornados", ge=1),
+    offset: int = Query(0, description="Quantidade de livros a pular", ge=0)
 ):
     """Filtra livros dentro de uma faixa de preço específica"""
     if min > max:
         raise HTTPException(status_code=400, detail="Preço mínimo não pode ser maior que o preço máximo")
     
-    books = data_service.get_books_by_price_range(min, max)
-    return PriceRangeFilter(
-        livros=books,
-        total=len(books),
-        preco_minimo=min,
-        preco_maximo=max
+    key = response_cache_key("price-range", min, max, sort, limit, offset)
+    body = data_service.response_cache.get_or_build(
+        key, lambda: data_service.get_books_by_price_range_json(min, max, sort=sort, limit=limit, offset=offset)
     )
+    return RawJSONResponse(body)
 
 @app.get("/api/v1/books/{book_id}", response_model=Book, tags=["Livros"])
 def get_book_by_id(book_id: int):
     """Retorna detalhes completos de um livro específico pelo ID"""
-    book = data_service.get_book_by_id(book_id)
-    if not book:
+    book = data_service.get_book_by_id_json(book_id)
+    if book is None:
         raise HTTPException(status_code=404, detail="Livro não encontrado")
-    return book
+    return RawJSONResponse(book)
 
 @app.get("/api/v1/categories", response_model=List[str], tags=["Categorias"])
-def get_all_categories():
+def get_all_categories(request: Request):
     """Lista todas as categorias de livros disponíveis"""
-    categories = data_service.get_all_categories()
-    return categories
+    payload = data_service.get_payload("categories", lambda: dumps(data_service.get_all_categories()))
+    return payload.response(request.headers.get("accept-encoding"))
 
 @app.get("/api/v1/health", response_model=HealthCheck, tags=["Sistema"])
 def health_check():
@@ -143,31 +272,138 @@ def health_check():
         data_file_exists=data_available
     )
 
+@app.get("/api/v1/admin/dataset", response_model=DatasetInfo, tags=["Sistema"])
+def get_dataset_info(_: dict = Depends(require_access_token)):
+    """Retorna a versão dos dados atualmente carregada"""
+    return DatasetInfo(**data_service.get_dataset_info())
+
+@app.post("/api/v1/admin/reload", response_model=DatasetInfo, tags=["Sistema"])
+def reload_dataset(_: dict = Depends(require_access_token)):
+    """Recarrega o CSV sem reiniciar a API; as requisições continuam usando os dados atuais até a troca"""
+    try:
+        data_service.load_data()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao recarregar dados (versão atual mantida): {str(e)}")
+    return DatasetInfo(**data_service.get_dataset_info())
+
+@app.get("/api/v1/admin/cache", response_model=ResponseCacheStats, tags=["Sistema"])
+def get_response_cache_stats(_: dict = Depends(require_access_token)):
+    """Acertos, falhas e ocupação do cache de respostas das consultas"""
+    return ResponseCacheStats(**data_service.response_cache.stats())
+
+@app.get("/api/v1/admin/prediction-cache", response_model=PredictionCacheStats, tags=["Sistema"])
+def get_prediction_cache_stats(_: dict = Depends(require_access_token)):
+    """Acertos, falhas e ocupação da memo de predições de rating"""
+    return PredictionCacheStats(**data_service.prediction_memo.stats())
+
 @app.get("/api/v1/stats/overview", response_model=StatsOverview, tags=["Estatísticas"])
-def get_stats_overview():
+def get_stats_overview(request: Request):
     """Estatísticas gerais da coleção (total de livros, preço médio, distribuição de ratings)"""
-    stats = data_service.get_stats_overview()
-    return StatsOverview(**stats)
+    def build():
+        stats = data_service.get_stats_overview()
+        return StatsOverview(**stats).model_dump_json().encode('utf-8')
+    
+    payload = data_service.get_payload("stats_overview", build)
+    return payload.response(request.headers.get("accept-encoding"))
 
 @app.get("/api/v1/stats/categories", response_model=StatsCategories, tags=["Estatísticas"])
-def get_stats_categories():
+def get_stats_categories(request: Request):
     """Estatísticas detalhadas por categoria (quantidade de livros, preços por categoria)"""
-    categories_stats = data_service.get_stats_by_category()
-    categories = [CategoryStats(**cat_stat) for cat_stat in categories_stats]
-    return StatsCategories(categorias=categories, total_categorias=len(categories))
+    def build():
+        categories_stats = data_service.get_stats_by_category()
+        categories = [CategoryStats(**cat_stat) for cat_stat in categories_stats]
+        stats = StatsCategories(categorias=categories, total_categorias=len(categories))
+        return stats.model_dump_json().encode('utf-8')
+    
+    payload = data_service.get_payload("stats_categories", build)
+    return payload.response(request.headers.get("accept-encoding"))
 
 # ML Endpoints
+def export_response(request: Request, fmt: str, name: str, build, cacheable: bool) -> Response:
+    """Resposta binária (npy/npz/arrow); sem amostragem nem divisão o arquivo é montado uma vez por versão dos dados"""
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="Formato Arrow indisponível (pyarrow não instalado)")
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{FILE_EXTENSIONS[fmt]}"'}
+    try:
+        if cacheable:
+            payload = data_service.get_payload(f"{name}.{fmt}", build)
+            return payload.response(request.headers.get("accept-encoding"), media_type=MEDIA_TYPES[fmt], headers=headers)
+        return Response(content=build(), media_type=MEDIA_TYPES[fmt], headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v1/ml/features", response_model=MLFeatures, tags=["Machine Learning"])
-def get_ml_features():
-    """Retorna dados formatados para features de machine learning"""
-    features = data_service.get_ml_features()
+def get_ml_features(
+    request: Request,
+    sample_size: Optional[int] = Query(None, description="Quantidade de livros da amostra aleatória", ge=1),
+    seed: int = Query(0, description="Semente da amostragem")
+):
+    """Retorna dados formatados para features de machine learning
+    
+    Aceita Accept: application/x-ndjson ou text/csv para receber as features em
+    streaming, e application/x-npy, application/x-npz ou
+    application/vnd.apache.arrow.stream para recebê-las em formato binário.
+    """
+    accept = request.headers.get("accept")
+    binary = export_format(accept)
+    if binary:
+        return export_response(
+            request, binary, "features",
+            lambda: data_service.export_ml_features(binary, sample_size=sample_size, seed=seed),
+            cacheable=sample_size is None
+        )
+    
+    fmt = streaming_format(accept)
+    if fmt:
+        if sample_size is not None:
+            raise HTTPException(status_code=400, detail="Amostragem não é suportada em streaming")
+        columns = ["id", "titulo_length", "preco", "rating", "disponibilidade_encoded", "categoria_encoded", "categoria"]
+        return stream_rows(data_service.iter_ml_features(), fmt, columns, filename="features")
+    
+    features = data_service.get_ml_features(sample_size=sample_size, seed=seed)
     return features
 
 @app.get("/api/v1/ml/training-data", response_model=TrainingData, tags=["Machine Learning"])
-def get_training_data():
-    """Retorna dataset formatado para treinamento de machine learning"""
-    training_data = data_service.get_training_data()
-    return training_data
+def get_training_data(
+    request: Request,
+    sample_size: Optional[int] = Query(None, description="Quantidade de amostras aleatórias", ge=1),
+    validation_fraction: Optional[float] = Query(None, description="Fração para validação (apenas npz e arrow)", gt=0, lt=1),
+    seed: int = Query(0, description="Semente da amostragem e da divisão treino/validação")
+):
+    """Retorna dataset formatado para treinamento de machine learning
+    
+    Aceita Accept: application/x-ndjson ou text/csv para receber as amostras
+    (features + rating) em streaming, e application/x-npy, application/x-npz ou
+    application/vnd.apache.arrow.stream para recebê-las em formato binário.
+    """
+    accept = request.headers.get("accept")
+    binary = export_format(accept)
+    if binary:
+        return export_response(
+            request, binary, "training_data",
+            lambda: data_service.export_training_data(
+                binary, sample_size=sample_size, validation_fraction=validation_fraction, seed=seed
+            ),
+            cacheable=sample_size is None and validation_fraction is None
+        )
+    if validation_fraction is not None:
+        raise HTTPException(status_code=400, detail="A divisão treino/validação exige o formato npz ou arrow")
+    
+    fmt = streaming_format(accept)
+    if fmt:
+        if sample_size is not None:
+            raise HTTPException(status_code=400, detail="Amostragem não é suportada em streaming")
+        columns = data_service.TRAINING_FEATURE_NAMES + ["rating"]
+        return stream_rows(data_service.iter_training_data(), fmt, columns, filename="training_data")
+    
+    if sample_size is not None:
+        return data_service.get_training_data(sample_size=sample_size, seed=seed)
+    
+    def build():
+        return data_service.get_training_data().model_dump_json().encode('utf-8')
+    
+    payload = data_service.get_payload("training_data", build)
+    return payload.response(request.headers.get("accept-encoding"))
 
 @app.post("/api/v1/ml/predictions", response_model=PredictionResponse, tags=["Machine Learning"])
 def predict_rating(request: PredictionRequest):
@@ -188,6 +424,100 @@ def predict_rating(request: PredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro na predição: {str(e)}")
 
+def batch_too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+def score_batch(body: bytes, ndjson: bool) -> List[dict]:
+    """Valida as entradas do lote e calcula as predições de uma vez.
+    
+    O número de entradas é conferido antes da validação pydantic, que é a
+    parte cara; um JSON inválido ou que não seja uma lista vai direto para a
+    validação, que reporta o erro.
+    """
+    if ndjson:
+        lines = [line for line in body.splitlines() if line.strip()]
+        if len(lines) > MAX_BATCH_SIZE:
+            raise batch_too_large(f"O lote deve ter no máximo {MAX_BATCH_SIZE} entradas")
+        body = b"[" + b",".join(lines) + b"]"
+    try:
+        data = loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, list) and len(data) > MAX_BATCH_SIZE:
+        raise batch_too_large(f"O lote deve ter no máximo {MAX_BATCH_SIZE} entradas")
+    try:
+        items = prediction_batch.validate_python(data) if isinstance(data, list) else prediction_batch.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([
+            dict(error, loc=("body", *error["loc"])) for error in e.errors(include_url=False)
+        ])
+    
+    result = data_service.predict_ratings(
+        titulo_length=[item.titulo_length for item in items],
+        preco=[item.preco for item in items],
+        disponibilidade=[item.disponibilidade for item in items],
+        categoria=[item.categoria for item in items]
+    )
+    return [
+        {"predicted_rating": rating, "confidence": confidence}
+        for rating, confidence in zip(result["predicted_rating"].tolist(), result["confidence"].tolist())
+    ]
+
+@app.post(
+    "/api/v1/ml/predictions/batch",
+    response_model=BatchPredictionResponse,
+    tags=["Machine Learning"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/PredictionRequest"}}
+                },
+                NDJSON_MEDIA_TYPE: {"schema": {"type": "string", "description": "Um PredictionRequest por linha"}},
+            },
+        }
+    },
+)
+async def predict_ratings_batch(request: Request):
+    """Predições de rating em lote.
+    
+    Recebe uma lista JSON de entradas (ou NDJSON, uma por linha, com
+    Content-Type: application/x-ndjson) e retorna as predições na mesma ordem.
+    Com Accept: application/x-ndjson as predições voltam uma por linha.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BATCH_BYTES:
+        raise batch_too_large(f"O corpo do lote deve ter no máximo {MAX_BATCH_BYTES} bytes")
+    # O limite também vale para corpos sem Content-Length (chunked)
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BATCH_BYTES:
+            raise batch_too_large(f"O corpo do lote deve ter no máximo {MAX_BATCH_BYTES} bytes")
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    ndjson = request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE)
+    predictions = await run_in_threadpool(score_batch, body, ndjson)
+    
+    fmt = streaming_format(request.headers.get("accept"))
+    if fmt:
+        return stream_rows(iter(predictions), fmt, ["predicted_rating", "confidence"], filename="predictions")
+    return RawJSONResponse(dumps({"predictions": predictions, "total": len(predictions)}))
+
+@app.get("/api/v1/ml/model", response_model=ModelInfo, tags=["Machine Learning"])
+def get_model_info():
+    """Modelo de rating em uso: tipo, versão, dados de treino e métricas de validação"""
+    return ModelInfo(**data_service.get_model_info())
+
+@app.post("/api/v1/ml/model/retrain", response_model=ModelInfo, status_code=status.HTTP_202_ACCEPTED, tags=["Machine Learning"])
+def retrain_model(_: dict = Depends(require_access_token)):
+    """Retreina o modelo com os dados atuais em segundo plano; o modelo atual segue respondendo até a troca"""
+    if not data_service.retrain_model():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Já existe um treino em andamento")
+    return ModelInfo(**data_service.get_model_info())
+
 # Authentication Endpoints
 @app.post("/api/v1/auth/login", response_model=TokenResponse, tags=["Autenticação"])
 def login(request: LoginRequest):
@@ -0,0 +1,81 @@
+"""
+Exportação binária dos dados de Machine Learning (.npy, .npz e Arrow IPC)
+
+Os formatos são negociados pelo cabeçalho Accept e montados direto das
+matrizes do FeatureStore, sem passar por listas Python nem por JSON.
+"""
+
+import io
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional; sem ele o formato Arrow não é oferecido
+    pa = None
+
+NPY_MEDIA_TYPE = "application/x-npy"
+NPZ_MEDIA_TYPE = "application/x-npz"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+EXPORT_FORMATS = {
+    NPY_MEDIA_TYPE: "npy",
+    NPZ_MEDIA_TYPE: "npz",
+    ARROW_MEDIA_TYPE: "arrow",
+}
+
+MEDIA_TYPES = {fmt: media_type for media_type, fmt in EXPORT_FORMATS.items()}
+
+FILE_EXTENSIONS = {"npy": "npy", "npz": "npz", "arrow": "arrows"}
+
+
+def export_format(accept: Optional[str]) -> Optional[str]:
+    """Formato binário pedido no cabeçalho Accept ("npy", "npz", "arrow" ou None)"""
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in EXPORT_FORMATS:
+            return EXPORT_FORMATS[media_type]
+    return None
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def to_npy(array: np.ndarray) -> bytes:
+    """Serializa um array no formato .npy"""
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def to_npz(arrays: Dict[str, np.ndarray]) -> bytes:
+    """Serializa vários arrays nomeados no formato .npz (sem compressão; a resposta HTTP já pode ser comprimida)"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def to_arrow(columns: Dict[str, np.ndarray], dictionaries: Optional[Dict[str, list]] = None) -> bytes:
+    """Serializa colunas como um stream Arrow IPC.
+
+    dictionaries mapeia o nome de uma coluna de códigos inteiros para o seu
+    vocabulário, gerando uma coluna de dicionário (ex.: categoria).
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado")
+    dictionaries = dictionaries or {}
+    arrays = {}
+    for name, values in columns.items():
+        if name in dictionaries:
+            arrays[name] = pa.DictionaryArray.from_arrays(
+                pa.array(values.astype(np.int32)), pa.array(dictionaries[name], type=pa.string())
+            )
+        else:
+            arrays[name] = pa.array(values)
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
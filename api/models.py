@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
@@ -14,12 +15,45 @@ class BookSearch(BaseModel):
     books: List[Book]
     total: int
     
+class BookQueryResult(BaseModel):
+    books: List[Book]
+    total: int
+    plan: List[str]
+
 class HealthCheck(BaseModel):
     status: str
     message: str
     total_books: int
     data_file_exists: bool
 
+class DatasetInfo(BaseModel):
+    version: str
+    total_books: int
+    loaded_at: datetime
+    source_path: str
+    auto_reload_interval: float
+
+class ResponseCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    expirations: int
+    invalidations: int
+
+class PredictionCacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
 class StatsOverview(BaseModel):
     total_livros: int
     preco_medio: float
@@ -78,6 +112,25 @@ class PredictionResponse(BaseModel):
     confidence: float
     input_features: Dict[str, Any]
 
+class ModelInfo(BaseModel):
+    kind: str
+    version: str
+    status: str
+    stale: bool = False
+    dataset_version: Optional[str] = None
+    trained_at: Optional[datetime] = None
+    metrics: Optional[Dict[str, Any]] = None
+    rejected_version: Optional[str] = None
+    last_error: Optional[str] = None
+
+class BatchPrediction(BaseModel):
+    predicted_rating: int
+    confidence: float
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPrediction]
+    total: int
+
 # Authentication Models
 class LoginRequest(BaseModel):
     username: str = Field(..., example="usuario", description="Nome de usuário")
@@ -0,0 +1,269 @@
+"""
+Planejador de consultas com múltiplos filtros sobre o BookStore
+
+Cada filtro (categoria, rating mínimo, faixa de preço, título, em estoque) sabe
+estimar quantos livros atende, gerar os candidatos a partir do seu índice e
+verificar uma posição isolada. O plano junta os filtros de bitmap (categoria,
+rating e estoque) com AND, escolhe o filtro mais seletivo para gerar os
+candidatos e verifica os demais linha a linha, do mais para o menos seletivo.
+Com limit, a ordenação usa seleção parcial por heap em vez de ordenar tudo.
+"""
+
+import heapq
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+from book_store import BookStore
+from search_index import normalize_text
+
+AVAILABLE_PATTERN = re.compile(r'^(\d+) disponível$')
+
+# Ordenações aceitas: chave de ordenação sobre a posição do livro
+SORT_OPTIONS = ("id", "preco", "-preco", "rating", "-rating", "titulo")
+
+# Posições dos bits ligados em cada valor de byte
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def is_in_stock(disponibilidade: str) -> bool:
+    """Indica se o texto de disponibilidade representa um livro em estoque"""
+    if "Em estoque" in disponibilidade or "In stock" in disponibilidade:
+        return True
+    match = AVAILABLE_PATTERN.match(disponibilidade)
+    return bool(match and int(match.group(1)) > 0)
+
+
+def bitmap_from_offsets(offsets: Iterable[int], size: int) -> int:
+    """Monta um bitmap (int) com os bits das posições informadas"""
+    bits = bytearray((size + 7) // 8)
+    for offset in offsets:
+        bits[offset >> 3] |= 1 << (offset & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_offsets(bitmap: int, size: int) -> List[int]:
+    """Posições (em ordem crescente) dos bits ligados do bitmap"""
+    offsets = []
+    for index, value in enumerate(bitmap.to_bytes((size + 7) // 8, 'little')):
+        if value:
+            base = index << 3
+            offsets.extend(base + bit for bit in _BYTE_BITS[value])
+    return offsets
+
+
+class FilterIndexes:
+    """Bitmaps por categoria, por rating e de disponibilidade em estoque.
+
+    Montados em uma única passada pelas colunas, uma vez por versão dos dados.
+    """
+
+    def __init__(self, store: BookStore):
+        size = len(store)
+        by_category: List[List[int]] = [[] for _ in store.categorias]
+        by_rating: Dict[int, List[int]] = {}
+        in_stock = bytearray(size)
+        for i in range(size):
+            by_category[store.categoria_codes[i]].append(i)
+            by_rating.setdefault(store.ratings[i], []).append(i)
+            if is_in_stock(store.disponibilidades[i]):
+                in_stock[i] = 1
+
+        self.size = size
+        self.category_bitmaps = [bitmap_from_offsets(offsets, size) for offsets in by_category]
+        self.rating_bitmaps = {rating: bitmap_from_offsets(offsets, size) for rating, offsets in by_rating.items()}
+        self.in_stock = in_stock
+        self.in_stock_bitmap = bitmap_from_offsets((i for i in range(size) if in_stock[i]), size)
+        self.all_bitmap = (1 << size) - 1
+
+    def rating_at_least(self, min_rating: int) -> int:
+        """Bitmap dos livros com rating maior ou igual ao informado"""
+        bitmap = 0
+        for rating, rating_bitmap in self.rating_bitmaps.items():
+            if rating >= min_rating:
+                bitmap |= rating_bitmap
+        return bitmap
+
+
+class Predicate:
+    """Filtro da consulta"""
+
+    # Ordem em que candidates() gera as posições ("id" ou "preco")
+    order = "id"
+
+    def __init__(self, description: str, estimate: int):
+        self.description = description
+        self.estimate = estimate
+
+    def candidates(self) -> Iterable[int]:
+        raise NotImplementedError
+
+    def matches(self, offset: int) -> bool:
+        raise NotImplementedError
+
+
+class BitmapPredicate(Predicate):
+    """AND dos filtros de bitmap; a verificação por linha usa as colunas"""
+
+    def __init__(self, description: str, bitmap: int, size: int, checks: List[Callable[[int], bool]]):
+        super().__init__(description, bitmap.bit_count())
+        self.bitmap = bitmap
+        self.size = size
+        self.checks = checks
+
+    def candidates(self) -> Iterable[int]:
+        return bitmap_offsets(self.bitmap, self.size)
+
+    def matches(self, offset: int) -> bool:
+        return all(check(offset) for check in self.checks)
+
+
+class PriceRangePredicate(Predicate):
+    """Faixa de preço sobre o índice de preço ordenado"""
+
+    order = "preco"
+
+    def __init__(self, store: BookStore, min_price: float, max_price: float):
+        self.store = store
+        self.min_price = min_price
+        self.max_price = max_price
+        self.start, self.end = store.price_range_bounds(min_price, max_price)
+        super().__init__("índice de preço", self.end - self.start)
+
+    def candidates(self) -> Iterable[int]:
+        return self.store.price_order[self.start:self.end]
+
+    def matches(self, offset: int) -> bool:
+        return self.min_price <= self.store.precos[offset] <= self.max_price
+
+
+class TitlePredicate(Predicate):
+    """Título contém o texto, pelo índice de trigramas"""
+
+    def __init__(self, store: BookStore, title: str):
+        self.index = store.title_index
+        self.title = title
+        self.normalized = normalize_text(title)
+        super().__init__("índice de título", self.index.estimate(title))
+
+    def candidates(self) -> Iterable[int]:
+        return self.index.search(self.title, "substring")
+
+    def matches(self, offset: int) -> bool:
+        return self.normalized in self.index.normalized[offset]
+
+
+class FullScan(Predicate):
+    """Sem filtros: todos os livros"""
+
+    def __init__(self, size: int):
+        super().__init__("varredura completa", size)
+        self.size = size
+
+    def candidates(self) -> Iterable[int]:
+        return range(self.size)
+
+    def matches(self, offset: int) -> bool:
+        return True
+
+
+def _sort_key(store: BookStore, sort: str):
+    """Chave de ordenação sobre a posição do livro (desempate pelo id)"""
+    if sort == "id":
+        return None
+    if sort == "preco":
+        return lambda i: (store.precos[i], i)
+    if sort == "-preco":
+        # Empates em ordem decrescente, como na leitura invertida do índice de preço
+        return lambda i: (-store.precos[i], -i)
+    if sort == "rating":
+        return lambda i: (store.ratings[i], i)
+    if sort == "-rating":
+        return lambda i: (-store.ratings[i], i)
+    if sort == "titulo":
+        return lambda i: (store.titulos[i], i)
+    raise ValueError(f"Ordenação inválida: {sort}")
+
+
+def run_query(store: BookStore, indexes: FilterIndexes, categoria: Optional[str] = None,
+              min_rating: Optional[int] = None, min_price: Optional[float] = None,
+              max_price: Optional[float] = None, title: Optional[str] = None,
+              in_stock: Optional[bool] = None, sort: str = "id",
+              limit: Optional[int] = None, offset: int = 0) -> Dict[str, object]:
+    """Planeja e executa a consulta.
+
+    Retorna {"offsets": posições da página, "total": quantidade de livros que
+    atendem aos filtros, "plan": descrição dos passos executados}.
+    """
+    key = _sort_key(store, sort)
+    size = len(store)
+    plan = []
+
+    # Filtros de bitmap, combinados com AND do mais seletivo para o menos seletivo
+    bitmaps = []
+    checks = []
+    if categoria is not None:
+        categoria_lower = categoria.lower()
+        codes = [code for code, name in enumerate(store.categorias) if name.lower() == categoria_lower]
+        code = codes[0] if codes else -1
+        bitmaps.append(("categoria", indexes.category_bitmaps[code] if code >= 0 else 0))
+        checks.append(lambda i: store.categoria_codes[i] == code)
+    if min_rating is not None:
+        bitmaps.append(("rating", indexes.rating_at_least(min_rating)))
+        checks.append(lambda i: store.ratings[i] >= min_rating)
+    if in_stock is not None:
+        stock_bitmap = indexes.in_stock_bitmap if in_stock else indexes.all_bitmap ^ indexes.in_stock_bitmap
+        bitmaps.append(("estoque", stock_bitmap))
+        checks.append(lambda i: bool(indexes.in_stock[i]) == in_stock)
+
+    predicates: List[Predicate] = []
+    if bitmaps:
+        bitmaps.sort(key=lambda item: item[1].bit_count())
+        combined = bitmaps[0][1]
+        for _, bitmap in bitmaps[1:]:
+            if not combined:
+                break
+            combined &= bitmap
+        names = " & ".join(name for name, _ in bitmaps)
+        predicates.append(BitmapPredicate(f"bitmap ({names})", combined, size, checks))
+    if min_price is not None or max_price is not None:
+        predicates.append(PriceRangePredicate(
+            store,
+            min_price if min_price is not None else float("-inf"),
+            max_price if max_price is not None else float("inf"),
+        ))
+    if title:
+        predicates.append(TitlePredicate(store, title))
+
+    # O filtro mais seletivo gera os candidatos; os demais são verificados por linha
+    predicates.sort(key=lambda predicate: predicate.estimate)
+    driver = predicates[0] if predicates else FullScan(size)
+    residuals = predicates[1:]
+    plan.append(f"candidatos: {driver.description} (~{driver.estimate} livros)")
+    for predicate in residuals:
+        plan.append(f"filtro: {predicate.description} (~{predicate.estimate} livros)")
+
+    if driver.estimate == 0:
+        matches = []
+    elif residuals:
+        matches = [i for i in driver.candidates() if all(p.matches(i) for p in residuals)]
+    else:
+        matches = list(driver.candidates())
+
+    stop = None if limit is None else offset + limit
+    if sort == driver.order:
+        plan.append(f"ordenação: já na ordem do índice ({sort})")
+        page = matches[offset:stop]
+    elif sort == "-preco" and driver.order == "preco":
+        plan.append("ordenação: ordem inversa do índice de preço")
+        page = matches[::-1][offset:stop]
+    elif sort == "id":
+        plan.append("ordenação: por id")
+        page = sorted(matches)[offset:stop] if stop is None else heapq.nsmallest(stop, matches)[offset:]
+    elif stop is not None:
+        plan.append(f"ordenação: heap parcial ({stop} de {len(matches)})")
+        page = heapq.nsmallest(stop, matches, key=key)[offset:]
+    else:
+        plan.append(f"ordenação: completa ({len(matches)} livros)")
+        page = sorted(matches, key=key)[offset:]
+
+    return {"offsets": page, "total": len(matches), "plan": plan}
@@ -0,0 +1,449 @@
+"""
+Modelos de predição de rating
+
+O modelo padrão é uma regressão logística multinomial em NumPy puro, treinada
+sobre a matriz do FeatureStore: as colunas numéricas são padronizadas e a
+categoria entra como um vetor de pesos por categoria (equivalente ao one-hot,
+sem montar a matriz). A confiança é a probabilidade da classe prevista.
+
+O artefato treinado fica em disco como dois arquivos: os parâmetros em um
+único .npy (carregado com mmap) e um .json com o layout dos parâmetros, o
+vocabulário de categorias, a versão dos dados usada no treino e as métricas.
+Enquanto não houver modelo treinado, a heurística original é usada.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from feature_store import FEATURE_NAMES, encode_with_vocabulary
+
+# Diretório dos artefatos do modelo; vazio usa o diretório do CSV
+MODEL_DIR = os.getenv("BOOKS_MODEL_DIR", "")
+
+# Treina um modelo em segundo plano na inicialização quando não há artefato salvo
+AUTO_TRAIN = os.getenv("BOOKS_MODEL_AUTO_TRAIN", "1") == "1"
+
+# Intervalo (em segundos) para verificar se outro processo salvou um novo modelo; 0 desativa
+MODEL_RELOAD_INTERVAL = float(os.getenv("BOOKS_MODEL_RELOAD_INTERVAL", "5"))
+
+METADATA_FILE = "rating_model.json"
+
+# Colunas numéricas usadas pela regressão (a categoria é tratada à parte)
+NUMERIC_FEATURES = ["titulo_length", "preco", "disponibilidade_encoded"]
+NUMERIC_COLUMNS = [FEATURE_NAMES.index(name) for name in NUMERIC_FEATURES]
+CATEGORY_COLUMN = FEATURE_NAMES.index("categoria_encoded")
+
+
+class HeuristicModel:
+    """Heurística original (preço, disponibilidade e tamanho do título)"""
+
+    kind = "heuristic"
+    version = "heuristic"
+
+    def __init__(self, metadata: Optional[dict] = None):
+        # Metadados do treino cujo modelo foi rejeitado (ver ModelRegistry._activate)
+        self.metadata = metadata or {}
+
+    def info(self) -> dict:
+        return dict(self.metadata, kind=self.kind, version=self.version)
+
+    def predict(self, titulo_length: np.ndarray, preco: np.ndarray,
+                disponibilidade_encoded: np.ndarray, categorias: List[str]):
+        """Retorna (ratings previstos, confianças)"""
+        # Heurística simples para predição
+        # Baseada em análise dos dados existentes
+        predicted = np.full(len(preco), 3.0)  # Rating padrão
+        confidence = np.full(len(preco), 0.5)
+
+        # Ajusta rating baseado no preço (livros mais caros tendem a ter ratings melhores)
+        expensive = preco > 50
+        cheap = ~expensive & (preco < 20)
+        predicted += np.where(expensive, 1.0, np.where(cheap, -1.0, 0.0))
+        confidence += np.where(expensive | cheap, 0.1, 0.0)
+
+        # Ajusta rating baseado na disponibilidade
+        in_stock = disponibilidade_encoded == 1
+        predicted += np.where(in_stock, 0.5, 0.0)
+        confidence += np.where(in_stock, 0.1, 0.0)
+
+        # Ajusta rating baseado no tamanho do título
+        predicted += np.where(titulo_length > 50, 0.3, np.where(titulo_length < 20, -0.3, 0.0))
+
+        # Limita rating entre 1 e 5
+        predicted = np.clip(np.round(predicted), 1, 5).astype(np.int64)
+        confidence = np.minimum(1.0, confidence)
+        return predicted, confidence
+
+
+class LogisticRatingModel:
+    """Regressão logística multinomial sobre as features do FeatureStore"""
+
+    kind = "logistic_regression"
+
+    def __init__(self, params: Dict[str, np.ndarray], vocabulary: List[str], classes: List[int],
+                 metadata: Optional[dict] = None):
+        self.mean = params["mean"]
+        self.scale = params["scale"]
+        self.weights = params["weights"]                    # (numéricas, classes)
+        self.category_weights = params["category_weights"]  # (categorias, classes)
+        self.bias = params["bias"]                          # (classes,)
+        self.vocabulary = np.array(vocabulary, dtype=str)
+        self.classes = np.array(classes, dtype=np.int64)
+        self.metadata = metadata or {}
+        self.version = self.metadata.get("version") or self._fingerprint()
+
+    def _fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        for name in ("mean", "scale", "weights", "category_weights", "bias"):
+            digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return digest.hexdigest()[:12]
+
+    def info(self) -> dict:
+        return dict(self.metadata, kind=self.kind, version=self.version)
+
+    def _logits(self, numeric: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        logits = ((numeric - self.mean) / self.scale) @ self.weights + self.bias
+        known = codes >= 0
+        if known.any():
+            logits[known] += self.category_weights[codes[known]]
+        return logits
+
+    def predict(self, titulo_length: np.ndarray, preco: np.ndarray,
+                disponibilidade_encoded: np.ndarray, categorias: List[str]):
+        """Retorna (ratings previstos, confianças)"""
+        numeric = np.column_stack([titulo_length, preco, disponibilidade_encoded]).astype(np.float64)
+        codes = encode_with_vocabulary(self.vocabulary, categorias)
+        probabilities = softmax(self._logits(numeric, codes))
+        best = probabilities.argmax(axis=1)
+        return self.classes[best], probabilities[np.arange(len(best)), best]
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def train_logistic(matrix: np.ndarray, labels: np.ndarray, vocabulary: List[str],
+                   dataset_version: str, epochs: int = 300, learning_rate: float = 0.05,
+                   l2: float = 1e-3, validation_fraction: float = 0.2,
+                   seed: int = 0) -> LogisticRatingModel:
+    """Treina a regressão logística com gradiente descendente (Adam) em lote completo.
+
+    Uma fração das amostras fica de fora para medir acurácia e log loss de validação.
+    Na mesma fração são medidas as referências (classe majoritária e heurística);
+    o modelo só é aceito (metadata["accepted"]) se superar a melhor delas.
+    """
+    numeric = matrix[:, NUMERIC_COLUMNS].astype(np.float64)
+    codes = matrix[:, CATEGORY_COLUMN].astype(np.int64)
+    classes = np.unique(labels).astype(np.int64)
+    targets = np.searchsorted(classes, labels)
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(labels))
+    validation_size = int(round(len(labels) * validation_fraction)) if len(labels) > 1 else 0
+    validation, train = order[:validation_size], order[validation_size:]
+
+    mean = numeric[train].mean(axis=0)
+    scale = numeric[train].std(axis=0)
+    scale[scale == 0] = 1.0
+    x = (numeric[train] - mean) / scale
+    c = codes[train]
+    y = np.zeros((len(train), len(classes)))
+    y[np.arange(len(train)), targets[train]] = 1.0
+
+    params = {
+        "weights": np.zeros((len(NUMERIC_FEATURES), len(classes))),
+        "category_weights": np.zeros((len(vocabulary), len(classes))),
+        "bias": np.zeros(len(classes)),
+    }
+    moments = {name: (np.zeros_like(value), np.zeros_like(value)) for name, value in params.items()}
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    n = max(len(train), 1)
+
+    for step in range(1, epochs + 1):
+        logits = x @ params["weights"] + params["category_weights"][c] + params["bias"]
+        error = (softmax(logits) - y) / n
+        category_grad = np.zeros_like(params["category_weights"])
+        np.add.at(category_grad, c, error)
+        grads = {
+            "weights": x.T @ error + l2 * params["weights"],
+            "category_weights": category_grad + l2 * params["category_weights"],
+            "bias": error.sum(axis=0),
+        }
+        for name, grad in grads.items():
+            m, v = moments[name]
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1 ** step)
+            v_hat = v / (1 - beta2 ** step)
+            params[name] -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+
+    params["mean"] = mean
+    params["scale"] = scale
+    model = LogisticRatingModel(params, vocabulary, classes.tolist())
+
+    metrics = {"train_samples": int(len(train)), "validation_samples": int(len(validation))}
+    if len(validation):
+        probabilities = softmax(model._logits(numeric[validation], codes[validation]))
+        expected = targets[validation]
+        metrics["validation_accuracy"] = float((probabilities.argmax(axis=1) == expected).mean())
+        metrics["validation_log_loss"] = float(
+            -np.log(np.clip(probabilities[np.arange(len(expected)), expected], 1e-12, None)).mean()
+        )
+        majority = classes[np.bincount(targets[train], minlength=len(classes)).argmax()]
+        heuristic, _ = HeuristicModel().predict(
+            numeric[validation, 0], numeric[validation, 1], numeric[validation, 2], []
+        )
+        metrics["majority_accuracy"] = float((labels[validation] == majority).mean())
+        metrics["heuristic_accuracy"] = float((labels[validation] == heuristic).mean())
+        metrics["baseline_accuracy"] = max(metrics["majority_accuracy"], metrics["heuristic_accuracy"])
+    model.metadata = {
+        "version": model.version,
+        "dataset_version": dataset_version,
+        "trained_at": datetime.utcnow().isoformat(),
+        "metrics": metrics,
+        "accepted": metrics.get("validation_accuracy", 0.0) > metrics.get("baseline_accuracy", 1.0),
+    }
+    return model
+
+
+PARAM_NAMES = ("mean", "scale", "weights", "category_weights", "bias")
+
+
+def save_model(model: LogisticRatingModel, directory: str):
+    """Grava o artefato: parâmetros em um .npy contíguo e metadados em JSON.
+
+    O .json é gravado por último e aponta para o .npy da mesma versão, então
+    um leitor nunca combina metadados e parâmetros de treinos diferentes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    layout = {}
+    position = 0
+    for name in PARAM_NAMES:
+        value = getattr(model, name)
+        layout[name] = [position, list(value.shape)]
+        position += value.size
+    flat = np.concatenate([np.ravel(getattr(model, name)).astype(np.float64) for name in PARAM_NAMES])
+
+    params_file = f"rating_model_{model.version}.npy"
+    # Nomes temporários por processo, para que dois workers nunca escrevam no mesmo arquivo
+    tmp_path = os.path.join(directory, f"{params_file}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as file:
+        np.save(file, flat, allow_pickle=False)
+    os.replace(tmp_path, os.path.join(directory, params_file))
+
+    metadata = dict(
+        model.metadata,
+        kind=model.kind,
+        params_file=params_file,
+        layout=layout,
+        vocabulary=model.vocabulary.tolist(),
+        classes=model.classes.tolist(),
+    )
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    metadata_tmp = f"{metadata_path}.{os.getpid()}.tmp"
+    with open(metadata_tmp, 'w', encoding='utf-8') as file:
+        json.dump(metadata, file, ensure_ascii=False)
+    os.replace(metadata_tmp, metadata_path)
+
+    # Remove parâmetros de versões anteriores; quem ainda os mapeia mantém o acesso
+    for name in os.listdir(directory):
+        if name.startswith("rating_model_") and name.endswith(".npy") and name != params_file:
+            os.remove(os.path.join(directory, name))
+
+
+def load_model(directory: str) -> Optional[LogisticRatingModel]:
+    """Carrega o artefato salvo (parâmetros mapeados com mmap) ou retorna None"""
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, encoding='utf-8') as file:
+        metadata = json.load(file)
+    flat = np.load(os.path.join(directory, metadata.pop("params_file")), mmap_mode='r')
+    params = {}
+    for name, (start, shape) in metadata.pop("layout").items():
+        size = int(np.prod(shape))
+        params[name] = flat[start:start + size].reshape(shape)
+    vocabulary = metadata.pop("vocabulary")
+    classes = metadata.pop("classes")
+    metadata.pop("kind", None)
+    return LogisticRatingModel(params, vocabulary, classes, metadata)
+
+
+class ModelRegistry:
+    """Modelo de rating ativo, com persistência e retreino em segundo plano.
+
+    A troca do modelo é uma atribuição de referência: as predições em andamento
+    terminam com o modelo anterior e as seguintes já usam o novo. Com vários
+    workers, o que treina salva o artefato e os demais o recarregam quando o
+    arquivo de metadados muda (ver start_watching).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.current = HeuristicModel()
+        self.status = "idle"
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._listeners = []
+        self._signature: Optional[tuple] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    def on_change(self, listener):
+        """Registra uma função chamada sempre que o modelo ativo muda"""
+        self._listeners.append(listener)
+
+    def _activate(self, model):
+        if not model.metadata.get("accepted", True):
+            # Modelo pior que a referência: mantém a heurística, guardando as métricas do treino
+            metadata = {key: value for key, value in model.metadata.items() if key not in ("version", "accepted")}
+            model = HeuristicModel(dict(metadata, rejected_version=model.version))
+        self.current = model
+        for listener in self._listeners:
+            listener()
+
+    def _metadata_signature(self) -> Optional[tuple]:
+        """Identifica a versão do arquivo de metadados no disco (inode, tamanho e mtime)"""
+        try:
+            stat = os.stat(os.path.join(self.directory, METADATA_FILE))
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def load(self) -> bool:
+        """Carrega o artefato salvo, se houver"""
+        self._signature = self._metadata_signature()
+        try:
+            model = load_model(self.directory)
+        except Exception as e:
+            print(f"Erro ao carregar modelo de rating: {e}")
+            return False
+        if model is None:
+            return False
+        self._activate(model)
+        return True
+
+    @contextmanager
+    def _training_lock(self):
+        """Lock de arquivo entre processos: só um worker treina e grava o artefato por vez"""
+        try:
+            import fcntl  # apenas POSIX; sem ele cada processo treina por conta própria
+        except ImportError:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "rating_model.lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def train(self, matrix: np.ndarray, labels: np.ndarray, vocabulary: List[str], dataset_version: str,
+              only_if_missing: bool = False):
+        """Treina, salva e ativa um novo modelo (bloqueante).
+
+        Com only_if_missing, se outro processo já salvou um modelo enquanto este
+        esperava o lock, esse modelo é carregado em vez de treinar outro.
+        """
+        with self._training_lock():
+            if only_if_missing and self._metadata_signature() is not None:
+                self.load()
+                return self.current
+            model = train_logistic(matrix, labels, vocabulary, dataset_version)
+            save_model(model, self.directory)
+            self._signature = self._metadata_signature()
+        self._activate(model)
+        return model
+
+    def retrain_async(self, load_training_set, only_if_missing: bool = False) -> bool:
+        """Inicia o retreino em uma thread; retorna False se já houver um em andamento.
+
+        load_training_set() retorna (matriz, labels, vocabulário, versão dos dados)
+        e roda já dentro da thread. only_if_missing é repassado para train().
+        """
+        with self._lock:
+            if self.status == "training":
+                return False
+            self.status = "training"
+
+        def run():
+            try:
+                matrix, labels, vocabulary, dataset_version = load_training_set()
+                if not len(labels):
+                    raise ValueError("Não há dados para treinar o modelo")
+                self.train(matrix, labels, vocabulary, dataset_version, only_if_missing)
+                self.last_error = None
+            except Exception as e:
+                print(f"Erro ao treinar modelo de rating: {e}")
+                self.last_error = str(e)
+            finally:
+                self.status = "idle"
+
+        self._worker = threading.Thread(target=run, name="rating-model-trainer", daemon=True)
+        self._worker.start()
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Recarrega o modelo se outro processo salvou um novo artefato desde a última carga"""
+        signature = self._metadata_signature()
+        if signature is None or signature == self._signature:
+            return False
+        return self.load()
+
+    def start_watching(self, interval: float):
+        """Inicia uma thread que verifica periodicamente se o artefato mudou"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    print(f"Erro ao recarregar modelo de rating: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="rating-model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Interrompe a verificação periódica do artefato"""
+        self._stop_watching.set()
+        self._watcher = None
+
+    def info(self) -> dict:
+        return dict(self.current.info(), status=self.status, last_error=self.last_error)
+
+
+def main():
+    """Treina o modelo a partir do CSV: python rating_model.py <csv> [<diretório>]"""
+    from book_store import BookStore
+    from data_service import file_version
+    from feature_store import FeatureStore
+
+    if len(sys.argv) < 2:
+        print("Uso: python rating_model.py <books_data.csv> [<diretório do modelo>]")
+        sys.exit(1)
+    csv_path = sys.argv[1]
+    directory = sys.argv[2] if len(sys.argv) > 2 else (MODEL_DIR or os.path.dirname(csv_path) or ".")
+
+    features = FeatureStore(BookStore.from_csv(csv_path))
+    registry = ModelRegistry(directory)
+    model = registry.train(features.matrix, features.labels, features.vocabulary, file_version(csv_path))
+    print(f"Modelo {model.version} salvo em: {directory} ({model.metadata['metrics']})")
+    if not model.metadata["accepted"]:
+        print("Modelo não supera a referência no conjunto de validação; a API seguirá usando a heurística")
+
+
+if __name__ == "__main__":
+    main()
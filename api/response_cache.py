@@ -0,0 +1,159 @@
+"""
+Cache de respostas das rotas de consulta
+
+Guarda o corpo JSON (bytes) de consultas repetidas, como buscas e faixas de
+preço, com chave nos parâmetros normalizados da consulta. O tamanho é limitado
+pelo total de bytes (descarte LRU) e cada entrada expira após o TTL. O
+DataService limpa o cache sempre que troca ou altera os dados.
+
+PredictionMemo faz o mesmo para predições de rating individuais, limitado
+pelo número de entradas e sem TTL: o resultado só muda com o modelo ou os
+dados, e a memo é limpa quando um deles muda.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Limite do cache em bytes e validade (em segundos) de cada entrada; 0 desativa o cache
+RESPONSE_CACHE_BYTES = int(os.getenv("BOOKS_RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("BOOKS_RESPONSE_CACHE_TTL", "300"))
+
+# Número máximo de predições memorizadas; 0 desativa a memo
+PREDICTION_CACHE_SIZE = int(os.getenv("BOOKS_PREDICTION_CACHE_SIZE", "4096"))
+
+
+class ResponseCache:
+    """Cache LRU (limitado em bytes) com TTL de corpos de resposta"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_BYTES, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def _remove(self, key: Hashable):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        """Retorna o corpo em cache para a chave ou o constrói com build() e o guarda"""
+        if not self.enabled:
+            return build()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+
+        # A consulta roda fora do lock; requisições simultâneas iguais podem calcular em dobro
+        body = build()
+        if len(body) > self.max_bytes:
+            return body
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return body
+
+    def clear(self):
+        """Descarta todas as entradas (os dados mudaram)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores e ocupação do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class PredictionMemo:
+    """Memo LRU (limitada em entradas) de resultados de predição"""
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Retorna o resultado memorizado para a chave ou o calcula com build() e o guarda"""
+        if self.max_entries <= 0:
+            return build()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Descarta todas as entradas (o modelo ou os dados mudaram)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores e ocupação da memo"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
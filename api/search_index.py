@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+SEARCH_MODES = ("substring", "prefix", "token")
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza o texto para busca: minúsculas e sem acentos"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(text: str) -> set:
+    """Retorna o conjunto de trigramas de um texto já normalizado"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex:
+    """Índice invertido de trigramas e tokens sobre os títulos normalizados.
+
+    As listas de postings guardam posições do armazenamento em ordem
+    crescente, então a busca intersecta as listas em vez de percorrer
+    todos os títulos.
+    """
+
+    def __init__(self, titles: Iterable[str] = ()):
+        self.normalized: List[str] = []
+        self.trigram_postings: Dict[str, array] = {}
+        self.token_postings: Dict[str, array] = {}
+        for title in titles:
+            self.add(title)
+
+    def add(self, title: str):
+        """Indexa um novo título na próxima posição"""
+        offset = len(self.normalized)
+        normalized = normalize_text(title)
+        self.normalized.append(normalized)
+        for gram in trigrams(normalized):
+            self.trigram_postings.setdefault(gram, array('l')).append(offset)
+        for token in set(TOKEN_PATTERN.findall(normalized)):
+            self.token_postings.setdefault(token, array('l')).append(offset)
+
+    def thaw(self):
+        """Copia estruturas somente leitura (ex.: de um snapshot) para permitir add"""
+        self.normalized = list(self.normalized)
+        self.trigram_postings = {gram: array('l', posting) for gram, posting in self.trigram_postings.items()}
+        self.token_postings = {token: array('l', posting) for token, posting in self.token_postings.items()}
+
+    def _intersect(self, postings: List[array]) -> List[int]:
+        """Intersecta listas de postings começando pela menor"""
+        if not postings:
+            return []
+        postings = sorted(postings, key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(posting)
+        return sorted(result)
+
+    def _candidates(self, query: str) -> Optional[List[int]]:
+        """Posições candidatas pelos trigramas da consulta (None se a consulta for curta demais)"""
+        grams = trigrams(query)
+        if not grams:
+            return None
+        postings = []
+        for gram in grams:
+            posting = self.trigram_postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        return self._intersect(postings)
+
+    def estimate(self, query: str) -> int:
+        """Limite superior barato da quantidade de títulos que contêm a consulta (menor posting)"""
+        grams = trigrams(normalize_text(query))
+        if not grams:
+            return len(self.normalized)
+        return min(len(self.trigram_postings.get(gram, ())) for gram in grams)
+
+    def search(self, query: str, mode: str = "substring") -> List[int]:
+        """Retorna as posições (em ordem crescente) dos títulos que casam com a consulta.
+
+        mode: "substring" (contém o texto), "prefix" (título começa com o texto)
+        ou "token" (contém todas as palavras da consulta)
+        """
+        normalized = normalize_text(query)
+        titles = self.normalized
+
+        if mode == "token":
+            postings = []
+            for token in set(TOKEN_PATTERN.findall(normalized)):
+                posting = self.token_postings.get(token)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            return self._intersect(postings)
+
+        if mode == "substring":
+            def matches(title):
+                return normalized in title
+        elif mode == "prefix":
+            def matches(title):
+                return title.startswith(normalized)
+        else:
+            raise ValueError(f"Modo de busca inválido: {mode}")
+
+        candidates = self._candidates(normalized)
+        if candidates is None:
+            candidates = range(len(titles))
+        # Os trigramas só filtram candidatos; a confirmação é feita no título
+        return [i for i in candidates if matches(titles[i])]
@@ -0,0 +1,237 @@
+"""
+Snapshot binário do BookStore
+
+Formato (todas as seções alinhadas em 8 bytes, na ordem de bytes nativa):
+
+    MAGIC (8 bytes) | tamanho do cabeçalho (uint64) | cabeçalho JSON | seções
+
+O cabeçalho guarda a versão dos dados, a assinatura do CSV de origem, a tabela
+de categorias, os agregados e a posição/tipo de cada seção. As seções são as
+colunas numéricas, os índices (id, preço, trigramas e tokens) e as tabelas de
+strings (offsets + bytes UTF-8). Na carga o arquivo é mapeado com mmap e as
+colunas viram memoryviews sobre o mapeamento, sem parsing, e os workers que
+abrem o mesmo arquivo compartilham as páginas em memória.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aggregates import CatalogAggregates
+from book_store import BookStore
+from search_index import TitleIndex
+
+MAGIC = b"BKSNAP01"
+HEADER_SIZE = struct.Struct("<Q")
+ALIGNMENT = 8
+
+
+class StringTable:
+    """Sequência de strings somente leitura sobre offsets + bytes UTF-8"""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _string_sections(strings: Iterable[str]) -> Tuple[array, bytes]:
+    """Codifica uma lista de strings como (offsets, bytes)"""
+    offsets = array('Q', [0])
+    chunks = []
+    position = 0
+    for value in strings:
+        encoded = value.encode('utf-8')
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return offsets, b"".join(chunks)
+
+
+def _postings_sections(postings: Dict[str, Iterable[int]]) -> Tuple[Dict[str, List[int]], array]:
+    """Concatena listas de postings em um único array, com o intervalo de cada chave.
+
+    As posições são gravadas como uint32 (metade do espaço de int64), o que
+    comporta catálogos de até 2**32 livros.
+    """
+    ranges = {}
+    values = array('I')
+    for key, posting in postings.items():
+        start = len(values)
+        values.fromlist(list(posting))
+        ranges[key] = [start, len(values)]
+    return ranges, values
+
+
+def _data_start(header_size: int) -> int:
+    """Posição (alinhada) onde começam as seções"""
+    position = len(MAGIC) + HEADER_SIZE.size + header_size
+    return position + (-position % ALIGNMENT)
+
+
+def write_snapshot(store: BookStore, path: str, version: str,
+                   source_signature: Optional[Tuple[int, int]] = None):
+    """Grava o BookStore (com índices e agregados) em um snapshot binário.
+
+    source_signature é (tamanho, mtime_ns) do CSV de origem, usado na carga
+    para detectar um snapshot desatualizado.
+    """
+    trigram_ranges, trigram_values = _postings_sections(store.title_index.trigram_postings)
+    token_ranges, token_values = _postings_sections(store.title_index.token_postings)
+
+    sections = {
+        "ids": array('q', store.ids),
+        "id_index": array('q', store.id_index),
+        "precos": array('d', store.precos),
+        "ratings": array('b', store.ratings),
+        "categoria_codes": array('I', store.categoria_codes),
+        "price_order": array('q', store.price_order),
+        "price_sorted": array('d', store.price_sorted),
+        "trigram_postings": trigram_values,
+        "token_postings": token_values,
+    }
+    if len(store) >= 2 ** 32:
+        raise ValueError("Catálogo grande demais para postings uint32")
+    for name, strings in (("titulos", store.titulos),
+                          ("disponibilidades", store.disponibilidades),
+                          ("imagens", store.imagens),
+                          ("normalized", store.title_index.normalized)):
+        offsets, blob = _string_sections(strings)
+        sections[f"{name}_offsets"] = offsets
+        sections[f"{name}_blob"] = array('B', blob)
+
+    # Posições das seções relativas ao início da área de dados, que começa
+    # (alinhada) logo após o cabeçalho
+    layout = {}
+    position = 0
+    for name, values in sections.items():
+        position += -position % ALIGNMENT
+        size = len(values) * values.itemsize
+        layout[name] = [position, size, values.typecode]
+        position += size
+
+    header = {
+        "version": version,
+        "source": list(source_signature) if source_signature else None,
+        "byteorder": sys.byteorder,
+        "count": len(store),
+        "next_id": store.next_id,
+        "categorias": list(store.categorias),
+        "aggregates": store.aggregates.to_dict(),
+        "trigrams": trigram_ranges,
+        "tokens": token_ranges,
+        "sections": layout,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(HEADER_SIZE.pack(len(header_bytes)))
+        file.write(header_bytes)
+        data_start = _data_start(len(header_bytes))
+        for name, values in sections.items():
+            offset, _, _ = layout[name]
+            file.write(b"\0" * (data_start + offset - file.tell()))
+            values.tofile(file)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path: str) -> dict:
+    """Lê apenas o cabeçalho do snapshot (com a posição da área de dados em data_start)"""
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Arquivo não é um snapshot válido: {path}")
+        (header_size,) = HEADER_SIZE.unpack(file.read(HEADER_SIZE.size))
+        header = json.loads(file.read(header_size))
+    header["data_start"] = _data_start(header_size)
+    return header
+
+
+def load_snapshot(path: str) -> Tuple[BookStore, dict]:
+    """Mapeia o snapshot com mmap e monta um BookStore somente leitura sobre ele.
+
+    Retorna (store, cabeçalho).
+    """
+    header = read_snapshot_header(path)
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError("Snapshot gerado em uma máquina com outra ordem de bytes")
+
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+
+    data_start = header["data_start"]
+
+    def section(name: str) -> memoryview:
+        offset, size, typecode = header["sections"][name]
+        start = data_start + offset
+        return view[start:start + size].cast(typecode)
+
+    def strings(name: str) -> StringTable:
+        return StringTable(section(f"{name}_offsets"), section(f"{name}_blob"))
+
+    store = BookStore()
+    store.ids = section("ids")
+    store.id_index = section("id_index")
+    store.precos = section("precos")
+    store.ratings = section("ratings")
+    store.categoria_codes = section("categoria_codes")
+    store.price_order = section("price_order")
+    store.price_sorted = section("price_sorted")
+    store.titulos = strings("titulos")
+    store.disponibilidades = strings("disponibilidades")
+    store.imagens = strings("imagens")
+    store.next_id = header["next_id"]
+    for categoria in header["categorias"]:
+        store.category_code(categoria)
+    store.aggregates = CatalogAggregates.from_dict(header["aggregates"])
+
+    title_index = TitleIndex()
+    title_index.normalized = strings("normalized")
+    trigram_values = section("trigram_postings")
+    title_index.trigram_postings = {
+        gram: trigram_values[start:end] for gram, (start, end) in header["trigrams"].items()
+    }
+    token_values = section("token_postings")
+    title_index.token_postings = {
+        token: token_values[start:end] for token, (start, end) in header["tokens"].items()
+    }
+    store.title_index = title_index
+    store.frozen = True
+    return store, header
+
+
+def main():
+    """Converte o CSV em snapshot: python snapshot.py <csv> [<snapshot>]"""
+    from data_service import file_version
+
+    if len(sys.argv) < 2:
+        print("Uso: python snapshot.py <books_data.csv> [<books_data.snap>]")
+        sys.exit(1)
+    csv_path = sys.argv[1]
+    snapshot_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(csv_path)[0] + ".snap"
+
+    stat = os.stat(csv_path)
+    store = BookStore.from_csv(csv_path)
+    write_snapshot(store, snapshot_path, file_version(csv_path), (stat.st_size, stat.st_mtime_ns))
+    print(f"Snapshot com {len(store)} livros salvo em: {snapshot_path}")
+
+
+if __name__ == "__main__":
+    main()
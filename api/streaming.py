@@ -0,0 +1,76 @@
+"""
+Respostas em streaming (NDJSON e CSV)
+
+As linhas vêm de geradores do DataService e são serializadas uma a uma, então a
+memória por requisição não cresce com o tamanho do catálogo e o cliente recebe
+as primeiras linhas antes do fim da serialização.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# Quantidade de linhas agrupadas em cada pedaço enviado
+CHUNK_ROWS = 500
+
+
+def streaming_format(accept: Optional[str]) -> Optional[str]:
+    """Formato de streaming pedido no cabeçalho Accept ("ndjson", "csv" ou None para JSON)"""
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type == NDJSON_MEDIA_TYPE:
+            return "ndjson"
+        if media_type == CSV_MEDIA_TYPE:
+            return "csv"
+    return None
+
+
+def _chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """Agrupa as linhas em pedaços para reduzir o número de escritas no socket"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= CHUNK_ROWS:
+            yield "".join(buffer).encode('utf-8')
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+def ndjson_lines(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Uma linha JSON por registro"""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    """Cabeçalho seguido de uma linha CSV por registro"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Cabeçalho quando não há nenhum registro
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_rows(rows: Iterable[Dict[str, Any]], fmt: str, columns: List[str],
+                filename: str = "data") -> StreamingResponse:
+    """StreamingResponse NDJSON ou CSV sobre um gerador de registros"""
+    if fmt == "csv":
+        return StreamingResponse(
+            _chunks(csv_lines(rows, columns)),
+            media_type=CSV_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    return StreamingResponse(_chunks(ndjson_lines(rows)), media_type=NDJSON_MEDIA_TYPE)
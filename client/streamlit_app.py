@@ -3,6 +3,8 @@ import requests
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+import threading
+from collections import OrderedDict
 
 # Configuração da página
 st.set_page_config(
@@ -30,12 +32,50 @@ def get_api_base_url():
 
 API_BASE_URL = get_api_base_url()
 
+# Quantidade máxima de respostas guardadas para requisições condicionais
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '64'))
+
+class ResponseCache:
+    """Respostas da API com o respectivo ETag, limitadas às mais recentes (LRU)"""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, endpoint):
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is not None:
+                self._entries.move_to_end(endpoint)
+            return entry
+    
+    def put(self, endpoint, etag, data):
+        with self._lock:
+            self._entries[endpoint] = (etag, data)
+            self._entries.move_to_end(endpoint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_response_cache():
+    """Cache de respostas compartilhado entre as execuções do script e as sessões"""
+    return ResponseCache(RESPONSE_CACHE_SIZE)
+
 def get_api_data(endpoint):
-    """Faz requisição para a API"""
+    """Faz requisição para a API (condicional, reaproveitando a resposta se o ETag não mudou)"""
+    cache = get_response_cache()
+    cached = cache.get(endpoint)
+    headers = {"If-None-Match": cached[0]} if cached else {}
     try:
-        response = requests.get(f"{API_BASE_URL}{endpoint}")
+        response = requests.get(f"{API_BASE_URL}{endpoint}", headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            if response.headers.get("ETag"):
+                cache.put(endpoint, response.headers["ETag"], data)
+            return data
         else:
             st.error(f"Erro na API: {response.status_code}")
             return None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark dos backends de parsing do scraper
+
+Compara o tempo de parsing de páginas de listagem e de detalhes em cada backend
+de page_parsers.py. Usa páginas HTML salvas em disco (--listing/--details) ou,
+se nenhuma for informada, baixa a primeira listagem e o primeiro livro do site.
+"""
+
+import argparse
+import timeit
+
+import requests
+
+from page_parsers import PARSERS, get_parser, lxml_html
+
+def load_pages(args):
+    """Retorna (listagens, detalhes) como listas de bytes"""
+    if args.listing or args.details:
+        listing = [open(path, 'rb').read() for path in args.listing]
+        details = [open(path, 'rb').read() for path in args.details]
+        return listing, details
+
+    print(f"Baixando páginas de exemplo de {args.base_url} ...")
+    listing_page = requests.get(args.base_url).content
+    books = get_parser("html.parser").parse_listing(listing_page, args.base_url, args.base_url)
+    details = [requests.get(books[0]['url']).content] if books else []
+    return [listing_page], details
+
+def benchmark(parser_name, listing, details, repeat):
+    """Tempo médio (ms) de parsing por página de listagem e de detalhes"""
+    parser = get_parser(parser_name)
+    results = {}
+    if listing:
+        total = timeit.timeit(lambda: [parser.parse_listing(page, "", "") for page in listing], number=repeat)
+        results['listagem'] = total / (repeat * len(listing)) * 1000
+    if details:
+        total = timeit.timeit(lambda: [parser.parse_details(page) for page in details], number=repeat)
+        results['detalhes'] = total / (repeat * len(details)) * 1000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os backends de parsing do scraper")
+    parser.add_argument("--listing", nargs="*", default=[], help="Páginas de listagem salvas")
+    parser.add_argument("--details", nargs="*", default=[], help="Páginas de detalhes salvas")
+    parser.add_argument("--base-url", default="https://books.toscrape.com/")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    listing, details = load_pages(args)
+    backends = [name for name in PARSERS if name != "lxml" or lxml_html is not None]
+
+    print(f"{'backend':<14}{'listagem (ms)':>16}{'detalhes (ms)':>16}")
+    for name in backends:
+        results = benchmark(name, listing, details, args.repeat)
+        print(f"{name:<14}{results.get('listagem', 0):>16.3f}{results.get('detalhes', 0):>16.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -4,256 +4,588 @@ Web Scraper para Books to Scrape
 Extrai informações de todos os livros do site https://books.toscrape.com/
 """
 
+import argparse
+import csv
+import hashlib
+import io
+import json
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+import threading
 import time
 import re
-from urllib.parse import urljoin, urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
+from page_parsers import get_parser, extract_rating, extract_price, DEFAULT_PARSER, PARSERS
+
+class TokenBucket:
+    """Limitador de taxa token bucket, seguro para uso entre threads"""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate  # tokens por segundo
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HttpCache:
+    """Cache de respostas HTTP em disco, usado para requisições condicionais.
+    
+    Cada URL tem um arquivo de metadados (ETag, Last-Modified, hash do corpo e
+    os dados já extraídos da página) e um arquivo com o corpo da resposta.
+    """
+    
+    def __init__(self, cache_dir=".http_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, url, suffix):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{suffix}")
+    
+    def _write(self, path, data):
+        """Escrita atômica: arquivo temporário seguido de rename"""
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    
+    def get(self, url):
+        """Retorna os metadados em cache da URL, ou None"""
+        try:
+            with open(self._path(url, "json"), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+    
+    def read_body(self, url):
+        with open(self._path(url, "body"), 'rb') as file:
+            return file.read()
+    
+    def put(self, url, response, body_hash, extracted=None):
+        """Grava a resposta e seus metadados"""
+        self._write(self._path(url, "body"), response.content)
+        self._save_entry(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body_hash': body_hash,
+            'extracted': extracted
+        })
+    
+    def set_extracted(self, url, extracted):
+        """Guarda os dados extraídos da página para evitar um novo parsing"""
+        entry = self.get(url)
+        if entry is not None:
+            entry['extracted'] = extracted
+            self._save_entry(url, entry)
+    
+    def _save_entry(self, url, entry):
+        self._write(self._path(url, "json"), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+class Page:
+    """Página baixada ou revalidada no cache.
+    
+    changed é False quando o servidor respondeu 304 ou o corpo é idêntico ao do
+    cache; nesse caso extracted traz os dados já extraídos anteriormente.
+    """
+    
+    def __init__(self, url, content=None, changed=True, extracted=None, loader=None):
+        self.url = url
+        self._content = content
+        self._loader = loader
+        self.changed = changed
+        self.extracted = extracted
+    
+    @property
+    def content(self):
+        if self._content is None and self._loader is not None:
+            self._content = self._loader()
+        return self._content
+
+COLUMN_ORDER = ['titulo', 'preco', 'rating', 'disponibilidade', 'categoria', 'imagem_url']
+
+class CheckpointedCsvWriter:
+    """Grava os livros em CSV à medida que cada página é concluída.
+    
+    As linhas vão para <saída>.partial e, após cada página, o tamanho do
+    arquivo e a URL da página são gravados (com fsync) em <saída>.checkpoint.
+    Ao retomar, o arquivo parcial é truncado no último checkpoint, descartando
+    uma página escrita pela metade, e as páginas concluídas são puladas.
+    Ao final, o arquivo parcial substitui a saída de uma só vez.
+    """
+    
+    def __init__(self, output_path, resume=False):
+        self.output_path = output_path
+        self.partial_path = f"{output_path}.partial"
+        self.checkpoint_path = f"{output_path}.checkpoint"
+        self.completed_pages = set()
+        
+        offset = 0
+        if resume and os.path.exists(self.partial_path) and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as checkpoint:
+                for line in checkpoint:
+                    page_offset, _, page_url = line.rstrip('\n').partition('\t')
+                    if page_url:
+                        offset = int(page_offset)
+                        self.completed_pages.add(page_url)
+            self.file = open(self.partial_path, 'r+b')
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            self.checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8')
+        else:
+            self.file = open(self.partial_path, 'wb')
+            self.checkpoint = open(self.checkpoint_path, 'w', encoding='utf-8')
+        
+        if offset == 0:
+            self._write_rows([], header=True)
+    
+    def _write_rows(self, rows, header=False):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMN_ORDER, extrasaction='ignore', lineterminator='\n')
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        self.file.write(buffer.getvalue().encode('utf-8'))
+    
+    def write_page(self, page_url, books):
+        """Grava os livros de uma página e registra o checkpoint"""
+        self._write_rows(books)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.checkpoint.write(f"{self.file.tell()}\t{page_url}\n")
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+        self.completed_pages.add(page_url)
+    
+    def close(self):
+        self.file.close()
+        self.checkpoint.close()
+    
+    def finish(self, keep_rows=None):
+        """Conclui a saída e mostra as estatísticas.
+        
+        keep_rows são linhas de um CSV anterior (modo incremental) que são
+        mantidas no final se o livro não apareceu nesta execução.
+        """
+        self.close()
+        
+        # Percorre o arquivo parcial calculando estatísticas sem carregá-lo inteiro
+        total = 0
+        price_sum = 0.0
+        rating_sum = 0
+        categories = set()
+        seen_images = set()
+        with open(self.partial_path, 'r', encoding='utf-8', newline='') as file:
+            for row in csv.DictReader(file):
+                total += 1
+                price_sum += float(row['preco'])
+                rating_sum += int(row['rating'])
+                categories.add(row['categoria'])
+                if keep_rows:
+                    seen_images.add(row['imagem_url'])
+        
+        if keep_rows:
+            kept = [row for row in keep_rows if row['imagem_url'] not in seen_images]
+            with open(self.partial_path, 'ab') as self.file:
+                self._write_rows(kept)
+            for row in kept:
+                total += 1
+                price_sum += row['preco']
+                rating_sum += row['rating']
+                categories.add(row['categoria'])
+            print(f"♻️ Modo incremental: {len(kept)} livros mantidos do CSV anterior")
+        
+        # Troca de uma vez, para que a API (que observa o CSV) nunca leia um arquivo pela metade
+        os.replace(self.partial_path, self.output_path)
+        os.remove(self.checkpoint_path)
+        print(f"📁 Dados salvos em: {self.output_path}")
+        
+        if total:
+            print(f"\n📊 Estatísticas:")
+            print(f"   Total de livros: {total}")
+            print(f"   Categorias únicas: {len(categories)}")
+            print(f"   Preço médio: £{price_sum / total:.2f}")
+            print(f"   Rating médio: {rating_sum / total:.1f}/5")
+        
+        return self.output_path
 
 class BooksScraper:
-    def __init__(self, base_url="https://books.toscrape.com/"):
+    def __init__(self, base_url="https://books.toscrape.com/", concurrency=8, rate_limit=10.0,
+                 cache_dir=None, parser=DEFAULT_PARSER):
         self.base_url = base_url
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # Permite conexões simultâneas suficientes para todas as threads
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.concurrency = max(1, concurrency)
+        # Limita as requisições por segundo para ser respeitoso com o servidor
+        self.rate_limiter = TokenBucket(rate_limit)
+        # Cache HTTP em disco para requisições condicionais (opcional)
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        # Backend de parsing do HTML ("lxml" ou "html.parser")
+        self.parser = get_parser(parser)
+        # Páginas de listagem já baixadas durante a descoberta, reaproveitadas no scraping
+        self.prefetched_pages = {}
         self.books_data = []
+        # Páginas cuja listagem ou algum detalhe falhou; ficam pendentes para o --resume
+        self.failed_pages = []
         
     def get_page(self, url):
-        """Faz requisição HTTP com tratamento de erro"""
+        """Faz requisição HTTP com tratamento de erro.
+        
+        Com cache habilitado, envia If-None-Match/If-Modified-Since e reaproveita
+        o corpo e os dados extraídos quando a página não mudou.
+        """
+        entry = self.cache.get(url) if self.cache else None
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        self.rate_limiter.acquire()
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, headers=headers)
+            if response.status_code == 304 and entry:
+                return Page(url, changed=False, extracted=entry.get('extracted'),
+                            loader=lambda: self.cache.read_body(url))
             response.raise_for_status()
-            return response
         except requests.RequestException as e:
             print(f"Erro ao acessar {url}: {e}")
             return None
+        
+        if not self.cache:
+            return Page(url, response.content)
+        
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        changed = entry is None or entry.get('body_hash') != body_hash
+        extracted = None if changed else entry.get('extracted')
+        self.cache.put(url, response, body_hash, extracted)
+        return Page(url, response.content, changed=changed, extracted=extracted)
+    
+    def remember_extracted(self, page, extracted):
+        """Guarda no cache os dados extraídos de uma página que mudou"""
+        if self.cache and page.changed:
+            self.cache.set_extracted(page.url, extracted)
     
     def extract_rating(self, rating_class):
         """Extrai o rating numérico da classe CSS"""
-        rating_map = {
-            'One': 1,
-            'Two': 2,
-            'Three': 3,
-            'Four': 4,
-            'Five': 5
-        }
-        
-        for rating_text, rating_value in rating_map.items():
-            if rating_text in rating_class:
-                return rating_value
-        return 0
+        return extract_rating(rating_class)
     
     def extract_price(self, price_text):
         """Extrai o valor numérico do preço"""
-        if price_text:
-            # Remove símbolos de moeda e converte para float
-            price_clean = re.sub(r'[£$€]', '', price_text.strip())
-            try:
-                return float(price_clean)
-            except ValueError:
-                return 0.0
-        return 0.0
+        return extract_price(price_text)
     
     def get_book_details(self, book_url):
-        """Extrai detalhes adicionais da página individual do livro"""
+        """Extrai detalhes adicionais da página individual do livro (None se falhar)"""
         response = self.get_page(book_url)
         if not response:
-            return None, None
-            
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extrair categoria
-        breadcrumb = soup.find('ul', class_='breadcrumb')
-        category = "N/A"
-        if breadcrumb:
-            category_links = breadcrumb.find_all('a')
-            if len(category_links) >= 2:
-                category = category_links[-1].text.strip()
-        
-        # Extrair disponibilidade
-        availability = "N/A"
-        availability_element = soup.find('p', class_='instock availability')
-        if availability_element:
-            availability_text = availability_element.text.strip()
-            # Extrair número de itens disponíveis
-            match = re.search(r'\((\d+) available\)', availability_text)
-            if match:
-                availability = f"{match.group(1)} disponível"
-            elif "In stock" in availability_text:
-                availability = "Em estoque"
+            return None
+        if response.extracted is not None:
+            return tuple(response.extracted)
         
+        category, availability = self.parser.parse_details(response.content)
+        self.remember_extracted(response, [category, availability])
         return category, availability
     
     def scrape_books_from_page(self, page_url):
-        """Extrai informações dos livros de uma página"""
+        """Extrai as informações da listagem de uma página.
+        
+        Cada livro retornado inclui 'url', a página de detalhes ainda não visitada.
+        Retorna None se a página não pôde ser baixada.
+        """
         print(f"Processando página: {page_url}")
         
-        response = self.get_page(page_url)
+        response = self.prefetched_pages.pop(page_url, None) or self.get_page(page_url)
         if not response:
-            return []
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        books = soup.find_all('article', class_='product_pod')
-        
-        page_books = []
-        
-        for book in books:
-            try:
-                # Título
-                title_element = book.find('h3').find('a')
-                title = title_element.get('title', 'N/A')
-                
-                # URL do livro para detalhes adicionais
-                book_relative_url = title_element.get('href')
-                book_url = urljoin(page_url, book_relative_url)
-                
-                # Preço
-                price_element = book.find('p', class_='price_color')
-                price_text = price_element.text if price_element else "0"
-                price = self.extract_price(price_text)
-                
-                # Rating
-                rating_element = book.find('p', class_='star-rating')
-                rating_class = rating_element.get('class', []) if rating_element else []
-                rating = self.extract_rating(' '.join(rating_class))
-                
-                # URL da imagem
-                img_element = book.find('div', class_='image_container').find('img')
-                img_url = urljoin(self.base_url, img_element.get('src', '')) if img_element else "N/A"
-                
-                # Obter detalhes adicionais da página do livro
-                category, availability = self.get_book_details(book_url)
-                
-                book_data = {
-                    'titulo': title,
-                    'preco': price,
-                    'rating': rating,
-                    'disponibilidade': availability,
-                    'categoria': category,
-                    'imagem_url': img_url
-                }
-                
-                page_books.append(book_data)
-                print(f"  ✓ Extraído: {title}")
-                
-                # Pequena pausa para ser respeitoso com o servidor
-                time.sleep(0.1)
-                
-            except Exception as e:
-                print(f"  ✗ Erro ao processar livro: {e}")
-                continue
+            return None
+        if response.extracted is not None:
+            return response.extracted
         
+        page_books = self.parser.parse_listing(response.content, page_url, self.base_url)
+        self.remember_extracted(response, page_books)
         return page_books
     
+    def complete_book(self, book, details):
+        """Combina os dados da listagem com os detalhes da página do livro"""
+        category, availability = details
+        book_data = {
+            'titulo': book['titulo'],
+            'preco': book['preco'],
+            'rating': book['rating'],
+            'disponibilidade': availability,
+            'categoria': category,
+            'imagem_url': book['imagem_url']
+        }
+        print(f"  ✓ Extraído: {book['titulo']}")
+        return book_data
+    
+    def page_url_template(self, second_page_url):
+        """Deduz o padrão de URL das páginas a partir da URL da página 2"""
+        match = re.search(r'page-2(\.html?)$', second_page_url or "")
+        if not match:
+            return None
+        return second_page_url[:match.start()] + 'page-{}' + match.group(1)
+    
     def get_all_pages(self):
-        """Descobre todas as páginas disponíveis"""
+        """Descobre todas as páginas disponíveis.
+        
+        Lê o total de páginas do texto "Page 1 of N" da primeira página e monta
+        as URLs das demais diretamente, sem percorrer os links "next" um a um.
+        Se a paginação não puder ser interpretada, segue os links "next".
+        As páginas baixadas aqui ficam em prefetched_pages para não serem
+        baixadas de novo no scraping.
+        """
         print("Descobrindo todas as páginas...")
         
         # Começar com a primeira página
-        current_url = self.base_url
-        page_urls = []
+        first_url = self.base_url
+        response = self.get_page(first_url)
+        if not response:
+            return [first_url]
+        self.prefetched_pages[first_url] = response
         
+        next_url, page_count = self.parser.parse_pagination(response.content, first_url)
+        template = self.page_url_template(next_url)
+        if page_count and template:
+            page_urls = [first_url] + [template.format(n) for n in range(2, page_count + 1)]
+            print(f"Encontradas {len(page_urls)} páginas para processar")
+            return page_urls
+        
+        # Sem "Page 1 of N": percorre os links "next"
+        page_urls = [first_url]
+        current_url = next_url
         while current_url:
             page_urls.append(current_url)
             
             response = self.get_page(current_url)
             if not response:
                 break
-                
-            soup = BeautifulSoup(response.content, 'html.parser')
+            self.prefetched_pages[current_url] = response
             
             # Procurar pelo botão "next"
-            next_button = soup.find('li', class_='next')
-            if next_button:
-                next_link = next_button.find('a')
-                if next_link:
-                    next_relative_url = next_link.get('href')
-                    current_url = urljoin(current_url, next_relative_url)
-                else:
-                    break
-            else:
-                break
+            current_url, _ = self.parser.parse_pagination(response.content, current_url)
         
         print(f"Encontradas {len(page_urls)} páginas para processar")
         return page_urls
     
-    def scrape_all_books(self):
-        """Executa o scraping completo de todos os livros"""
-        print("Iniciando scraping de todos os livros...")
+    def load_existing(self, csv_path):
+        """Lê um CSV gerado anteriormente, para o modo incremental"""
+        if not os.path.exists(csv_path):
+            return []
+        with open(csv_path, 'r', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        for row in rows:
+            row['preco'] = float(row['preco'])
+            row['rating'] = int(row['rating'])
+        return rows
+    
+    def _unchanged(self, book, existing_row):
+        """Verifica se os dados da listagem batem com a linha já salva"""
+        return (existing_row['titulo'] == book['titulo']
+                and existing_row['preco'] == book['preco']
+                and existing_row['rating'] == book['rating'])
+    
+    def _page_records(self, entries):
+        """Resolve os detalhes de uma página e monta as linhas finais, na ordem da listagem.
         
-        # Obter todas as URLs das páginas
-        page_urls = self.get_all_pages()
+        Retorna None se o detalhe de algum livro falhou: a página inteira fica
+        pendente, sem gravar linhas incompletas.
+        """
+        records = []
+        for book, detail_future, existing_row in entries:
+            if existing_row is not None:
+                records.append(dict(existing_row))
+                continue
+            details = detail_future.result()
+            if details is None:
+                return None
+            records.append(self.complete_book(book, details))
+        return records
+    
+    def scrape_all_books(self, existing=None, writer=None):
+        """Executa o scraping completo de todos os livros.
         
-        # Processar cada página
-        for i, page_url in enumerate(page_urls, 1):
-            print(f"\n--- Página {i}/{len(page_urls)} ---")
-            books_from_page = self.scrape_books_from_page(page_url)
-            self.books_data.extend(books_from_page)
-            
-            # Pausa entre páginas
-            time.sleep(0.5)
+        As páginas de listagem e de detalhes são baixadas em paralelo por um pool
+        de threads: assim que uma listagem é processada, os detalhes dos seus
+        livros entram na fila, sem esperar as demais páginas. A ordem dos livros
+        no resultado segue a ordem das páginas.
         
-        print(f"\n✅ Scraping concluído! Total de livros extraídos: {len(self.books_data)}")
-        return self.books_data
-    
-    def save_to_csv(self, filename="books_data.csv"):
-        """Salva os dados em arquivo CSV"""
-        if not self.books_data:
-            print("Nenhum dado para salvar!")
-            return
+        Com writer (CheckpointedCsvWriter), cada página concluída é gravada em
+        disco e descartada da memória; páginas já concluídas em uma execução
+        anterior são puladas. Sem writer, os livros são acumulados em books_data.
+        Apenas uma janela de páginas fica em andamento ao mesmo tempo.
         
-        # Salvar diretamente na pasta atual (data/)
-        filepath = filename
+        Páginas cuja listagem ou algum detalhe falhou não são gravadas nem
+        registradas no checkpoint; ficam em failed_pages e são refeitas com --resume.
         
-        df = pd.DataFrame(self.books_data)
+        Se existing (linhas de um CSV anterior) for informado, só as páginas de
+        detalhes de livros novos ou alterados são baixadas, e os livros antigos
+        que não apareceram na listagem são mantidos no final.
+        """
+        print(f"Iniciando scraping de todos os livros ({self.concurrency} conexões simultâneas)...")
         
-        # Reordenar colunas
-        column_order = ['titulo', 'preco', 'rating', 'disponibilidade', 'categoria', 'imagem_url']
-        df = df[column_order]
+        # Livros já salvos, indexados pela URL da imagem (única por livro)
+        existing_by_image = {row['imagem_url']: row for row in existing or []}
+        seen_images = set()
+        reused = 0
+        extracted = 0
         
-        df.to_csv(filepath, index=False, encoding='utf-8')
-        print(f"📁 Dados salvos em: {filepath}")
+        # Obter todas as URLs das páginas, pulando as já concluídas
+        page_urls = self.get_all_pages()
+        completed = writer.completed_pages if writer else set()
+        pending_urls = [url for url in page_urls if url not in completed]
+        if len(pending_urls) < len(page_urls):
+            print(f"⏩ Retomando: {len(page_urls) - len(pending_urls)} páginas já concluídas")
+        for url in completed:
+            self.prefetched_pages.pop(url, None)
         
-        # Mostrar estatísticas
-        print(f"\n📊 Estatísticas:")
-        print(f"   Total de livros: {len(df)}")
-        print(f"   Categorias únicas: {df['categoria'].nunique()}")
-        print(f"   Preço médio: £{df['preco'].mean():.2f}")
-        print(f"   Rating médio: {df['rating'].mean():.1f}/5")
+        window = max(2, self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            url_iter = iter(enumerate(pending_urls, 1))
+            listings = deque()
+            
+            def submit_next_listing():
+                item = next(url_iter, None)
+                if item:
+                    i, url = item
+                    listings.append((i, url, executor.submit(self.scrape_books_from_page, url)))
+            
+            for _ in range(window):
+                submit_next_listing()
+            
+            # Páginas cujos detalhes já foram enfileirados, aguardando gravação
+            staged = deque()
+            try:
+                while listings or staged:
+                    if listings:
+                        i, url, listing_future = listings.popleft()
+                        books_from_page = listing_future.result()
+                        if books_from_page is None:
+                            self.failed_pages.append(url)
+                            submit_next_listing()
+                            continue
+                        print(f"--- Página {i}/{len(pending_urls)}: {len(books_from_page)} livros ---")
+                        entries = []
+                        for book in books_from_page:
+                            if writer is None:
+                                seen_images.add(book['imagem_url'])
+                            existing_row = existing_by_image.get(book['imagem_url'])
+                            if existing_row and self._unchanged(book, existing_row):
+                                entries.append((book, None, existing_row))
+                                reused += 1
+                            else:
+                                entries.append((book, executor.submit(self.get_book_details, book['url']), None))
+                        staged.append((url, entries))
+                        submit_next_listing()
+
+                    # Grava as páginas na ordem, mantendo no máximo uma janela em memória
+                    while staged and (len(staged) > window or not listings):
+                        url, entries = staged.popleft()
+                        records = self._page_records(entries)
+                        if records is None:
+                            self.failed_pages.append(url)
+                            continue
+                        extracted += len(records)
+                        if writer:
+                            writer.write_page(url, records)
+                        else:
+                            self.books_data.extend(records)
+            except BaseException:
+                # Em caso de interrupção, não espera as requisições ainda na fila
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        if existing:
+            print(f"♻️ Modo incremental: {reused} livros reaproveitados")
+            if writer is None:
+                self.books_data.extend(row for row in existing if row['imagem_url'] not in seen_images)
         
-        return filepath
+        if self.failed_pages:
+            print(f"⚠️ {len(self.failed_pages)} páginas falharam e ficaram pendentes")
+        print(f"\n✅ Scraping concluído! Total de livros extraídos: {extracted}")
+        return self.books_data
+
+def parse_args():
+    """Lê as opções de linha de comando"""
+    parser = argparse.ArgumentParser(description="Web Scraper para Books to Scrape")
+    parser.add_argument("--base-url", default="https://books.toscrape.com/",
+                        help="URL inicial do site (útil para testar contra um servidor local)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Número máximo de requisições simultâneas")
+    parser.add_argument("--rate", type=float, default=10.0,
+                        help="Limite de requisições por segundo (0 desativa o limite)")
+    parser.add_argument("--output", default="books_data.csv",
+                        help="Arquivo CSV de saída")
+    parser.add_argument("--cache-dir", default=".http_cache",
+                        help="Diretório do cache HTTP usado para requisições condicionais")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Desativa o cache HTTP em disco")
+    parser.add_argument("--parser", default=DEFAULT_PARSER, choices=sorted(PARSERS),
+                        help="Backend de parsing do HTML")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Só baixa detalhes de livros novos ou alterados e mescla com o CSV existente")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma uma execução interrompida, pulando as páginas já gravadas")
+    return parser.parse_args()
 
 def main():
     """Função principal"""
+    args = parse_args()
+    
     print("🚀 Iniciando Web Scraper para Books to Scrape")
     print("=" * 50)
     
     # Criar instância do scraper
-    scraper = BooksScraper()
+    scraper = BooksScraper(base_url=args.base_url, concurrency=args.concurrency, rate_limit=args.rate,
+                           cache_dir=None if args.no_cache else args.cache_dir, parser=args.parser)
+    
+    # Os livros são gravados em disco a cada página concluída
+    writer = CheckpointedCsvWriter(args.output, resume=args.resume)
     
     try:
         # Executar scraping
-        scraper.scrape_all_books()
+        existing = scraper.load_existing(args.output) if args.incremental else None
+        scraper.scrape_all_books(existing=existing, writer=writer)
+        if scraper.failed_pages:
+            # Não conclui a saída: o CSV final ficaria sem os livros dessas páginas
+            raise RuntimeError(f"{len(scraper.failed_pages)} páginas não foram concluídas")
         
         # Salvar dados
-        csv_file = scraper.save_to_csv()
+        csv_file = writer.finish(keep_rows=existing)
         
         print(f"\n🎉 Processo concluído com sucesso!")
         print(f"📄 Arquivo CSV salvo: {csv_file}")
         
     except KeyboardInterrupt:
+        writer.close()
         print("\n⚠️ Processo interrompido pelo usuário")
-        if scraper.books_data:
-            print("Salvando dados parciais...")
-            scraper.save_to_csv("books_data_partial.csv")
+        print(f"Progresso salvo em {writer.partial_path}; execute novamente com --resume para continuar")
     except Exception as e:
+        writer.close()
         print(f"\n❌ Erro durante o scraping: {e}")
-        if scraper.books_data:
-            print("Salvando dados parciais...")
-            scraper.save_to_csv("books_data_partial.csv")
+        print(f"Progresso salvo em {writer.partial_path}; execute novamente com --resume para continuar")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+"""
+Backends de parsing de HTML para o scraper do Books to Scrape
+
+Todos os backends extraem os mesmos dados das páginas de listagem, de detalhes
+e da paginação; só mudam a biblioteca e a estratégia de parsing.
+"""
+
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # lxml é opcional; sem ele usamos o BeautifulSoup
+    lxml_html = None
+
+RATING_MAP = {
+    'One': 1,
+    'Two': 2,
+    'Three': 3,
+    'Four': 4,
+    'Five': 5
+}
+
+AVAILABLE_PATTERN = re.compile(r'\((\d+) available\)')
+PAGE_COUNT_PATTERN = re.compile(r'Page\s+\d+\s+of\s+(\d+)')
+
+def extract_rating(rating_class):
+    """Extrai o rating numérico da classe CSS"""
+    for rating_text, rating_value in RATING_MAP.items():
+        if rating_text in rating_class:
+            return rating_value
+    return 0
+
+def extract_price(price_text):
+    """Extrai o valor numérico do preço"""
+    if price_text:
+        # Remove símbolos de moeda e converte para float
+        price_clean = re.sub(r'[£$€]', '', price_text.strip())
+        try:
+            return float(price_clean)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+def extract_availability(availability_text):
+    """Converte o texto de disponibilidade para o formato salvo no CSV"""
+    match = AVAILABLE_PATTERN.search(availability_text)
+    if match:
+        return f"{match.group(1)} disponível"
+    if "In stock" in availability_text:
+        return "Em estoque"
+    return "N/A"
+
+def extract_page_count(pager_text):
+    """Extrai o total de páginas do texto "Page 1 of N" da paginação"""
+    match = PAGE_COUNT_PATTERN.search(pager_text or "")
+    return int(match.group(1)) if match else None
+
+def build_book(title, href, price_text, rating_class, img_src, page_url, base_url):
+    """Monta o dicionário de um livro da listagem a partir dos valores brutos"""
+    return {
+        'titulo': title,
+        'preco': extract_price(price_text),
+        'rating': extract_rating(rating_class),
+        'imagem_url': urljoin(base_url, img_src) if img_src is not None else "N/A",
+        'url': urljoin(page_url, href)
+    }
+
+class SoupPageParser:
+    """Parser com BeautifulSoup (html.parser) restrito por SoupStrainer.
+
+    O SoupStrainer faz o BeautifulSoup montar apenas os nós que interessam
+    (artigos product_pod, breadcrumb, disponibilidade e paginação), em vez da
+    árvore inteira da página.
+    """
+
+    name = "html.parser"
+
+    listing_strainer = SoupStrainer('article', class_='product_pod')
+    details_strainer = SoupStrainer(['ul', 'p'], class_=re.compile(r'\b(breadcrumb|availability)\b'))
+    pager_strainer = SoupStrainer('ul', class_='pager')
+
+    def parse_listing(self, content, page_url, base_url):
+        soup = BeautifulSoup(content, 'html.parser', parse_only=self.listing_strainer)
+        books = []
+        for book in soup.find_all('article', class_='product_pod'):
+            try:
+                title_element = book.find('h3').find('a')
+                price_element = book.find('p', class_='price_color')
+                rating_element = book.find('p', class_='star-rating')
+                img_element = book.find('div', class_='image_container').find('img')
+                books.append(build_book(
+                    title_element.get('title', 'N/A'),
+                    title_element.get('href'),
+                    price_element.text if price_element else "0",
+                    ' '.join(rating_element.get('class', [])) if rating_element else '',
+                    img_element.get('src', '') if img_element else None,
+                    page_url, base_url
+                ))
+            except Exception as e:
+                print(f"  ✗ Erro ao processar livro: {e}")
+                continue
+        return books
+
+    def parse_details(self, content):
+        soup = BeautifulSoup(content, 'html.parser', parse_only=self.details_strainer)
+
+        category = "N/A"
+        breadcrumb = soup.find('ul', class_='breadcrumb')
+        if breadcrumb:
+            category_links = breadcrumb.find_all('a')
+            if len(category_links) >= 2:
+                category = category_links[-1].text.strip()
+
+        availability = "N/A"
+        availability_element = soup.find('p', class_='instock availability')
+        if availability_element:
+            availability = extract_availability(availability_element.text.strip())
+
+        return category, availability
+
+    def parse_pagination(self, content, page_url):
+        """Retorna (URL da próxima página ou None, total de páginas ou None)"""
+        soup = BeautifulSoup(content, 'html.parser', parse_only=self.pager_strainer)
+        current = soup.find('li', class_='current')
+        page_count = extract_page_count(current.text) if current else None
+        next_button = soup.find('li', class_='next')
+        next_link = next_button.find('a') if next_button else None
+        if next_link and next_link.get('href'):
+            return urljoin(page_url, next_link.get('href')), page_count
+        return None, page_count
+
+def _has_class(name):
+    """Expressão XPath que testa se o elemento possui a classe CSS informada"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+class LxmlPageParser:
+    """Parser com lxml e consultas XPath direcionadas (o mais rápido)"""
+
+    name = "lxml"
+
+    def __init__(self):
+        if lxml_html is None:
+            raise ImportError("lxml não está instalado")
+        # O site é servido em UTF-8; fixar o encoding evita a detecção automática
+        self.html_parser = lxml_html.HTMLParser(encoding='utf-8')
+
+    def _document(self, content):
+        return lxml_html.fromstring(content, parser=self.html_parser)
+
+    def parse_listing(self, content, page_url, base_url):
+        doc = self._document(content)
+        books = []
+        for article in doc.xpath(f'//article[{_has_class("product_pod")}]'):
+            try:
+                title_element = article.xpath('.//h3/a')[0]
+                price_text = article.xpath(f'string(.//p[{_has_class("price_color")}])') or "0"
+                rating_class = article.xpath(f'string(.//p[{_has_class("star-rating")}]/@class)')
+                img_src = article.xpath(f'.//div[{_has_class("image_container")}]//img/@src')
+                books.append(build_book(
+                    title_element.get('title', 'N/A'),
+                    title_element.get('href'),
+                    price_text,
+                    rating_class,
+                    img_src[0] if img_src else None,
+                    page_url, base_url
+                ))
+            except Exception as e:
+                print(f"  ✗ Erro ao processar livro: {e}")
+                continue
+        return books
+
+    def parse_details(self, content):
+        doc = self._document(content)
+
+        category = "N/A"
+        category_links = doc.xpath(f'//ul[{_has_class("breadcrumb")}]//a')
+        if len(category_links) >= 2:
+            category = category_links[-1].text_content().strip()
+
+        availability = "N/A"
+        availability_element = doc.xpath('//p[@class="instock availability"]')
+        if availability_element:
+            availability = extract_availability(availability_element[0].text_content().strip())
+
+        return category, availability
+
+    def parse_pagination(self, content, page_url):
+        """Retorna (URL da próxima página ou None, total de páginas ou None)"""
+        doc = self._document(content)
+        page_count = extract_page_count(doc.xpath(f'string(//li[{_has_class("current")}])'))
+        next_href = doc.xpath(f'//li[{_has_class("next")}]/a/@href')
+        if next_href:
+            return urljoin(page_url, next_href[0]), page_count
+        return None, page_count
+
+PARSERS = {
+    SoupPageParser.name: SoupPageParser,
+    LxmlPageParser.name: LxmlPageParser,
+}
+
+DEFAULT_PARSER = LxmlPageParser.name if lxml_html is not None else SoupPageParser.name
+
+def get_parser(name=DEFAULT_PARSER):
+    """Cria o backend de parsing pelo nome ("lxml" ou "html.parser")"""
+    if name not in PARSERS:
+        raise ValueError(f"Parser desconhecido: {name} (opções: {', '.join(PARSERS)})")
+    return PARSERS[name]()